@@ -5,6 +5,9 @@
 __version__ = '7.7.0'
 
 import sys
+import time
+
+_import_start = time.perf_counter()
 if sys.version_info < (3, 10):
     sys.exit('Error: Ark requires Python 3.10 or later.')
 
@@ -24,14 +27,23 @@ if sys.platform == 'win32':
 # 'import ark' statement. Otherwise the user would have to import each module
 # individually as 'import ark.foo'.
 from . import cli
+from . import deps
 from . import extensions
 from . import hashes
+from . import manifest
 from . import events
 from . import filters
 from . import nodes
+from . import profiler
+from . import rendercache
 from . import renderers
 from . import site
+from . import sync
+from . import treecache
 from . import utils
+from . import writer
+
+extensions.import_times.append(('ark', None, time.perf_counter() - _import_start))
 
 
 def ark():
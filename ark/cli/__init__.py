@@ -4,17 +4,14 @@
 
 import ark
 import sys
+import time
+import importlib
 import argslib
 
-from . import build
-from . import init
-from . import clear
-from . import serve
-from . import watch
-from . import add
-from . import tree
-from . import open
-from . import deploy
+
+# Each built-in command is implemented by a module in this package. We only
+# import the module for the command being run.
+commands = ('add', 'build', 'clear', 'deploy', 'init', 'open', 'serve', 'tree', 'watch')
 
 
 helptext = f"""
@@ -30,6 +27,9 @@ Usage:
 
 Flags:
   -h, --help          Print the application's help text and exit.
+      --startup-profile
+                      Print the time taken to import each extension and
+                      command and exit.
   -v, --version       Print the application's version number and exit.
 
 Commands:
@@ -50,14 +50,70 @@ Command Help:
 
 # We store the root ArgParser instance globally so it's available to plugins.
 argparser = argslib.ArgParser(helptext, ark.__version__)
+argparser.flag("startup-profile")
+
+
+# Command modules can still be accessed as attributes of this package, e.g.
+# `ark.cli.build`. They're imported on first access.
+def __getattr__(name):
+    if name in commands:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
 
 # Parse the application's command-line arguments. Plugins can use the `CLI`
 # event to register their own custom commands.
 def parse_args():
+    if (name := _command_name(sys.argv[1:])) in commands:
+        _import_command(name)
+
     ark.events.fire(ark.events.Event.CLI, argparser)
     argparser.parse()
 
+    if argparser.found("startup-profile"):
+        print_startup_profile()
+        sys.exit()
+
     if argparser.command_name is None:
         print(helptext.strip())
         sys.exit()
+
+
+# Returns the name of the command specified on the command line, if any. The
+# command name must be the first argument, as in `ark build` or `ark help build`.
+def _command_name(args: list[str]) -> str|None:
+    if args and args[0] == "help":
+        args = args[1:]
+    return args[0] if args else None
+
+
+# Imports a command's module and records the time taken.
+def _import_command(name: str):
+    start = time.perf_counter()
+    importlib.import_module(f".{name}", __name__)
+    ark.extensions.import_times.append((f"command: {name}", None, time.perf_counter() - start))
+
+
+# Prints the time taken to import Ark, each extension and the modules it
+# imports lazily, and each built-in command. Lazily-imported modules and
+# commands which haven't been used yet are imported now so their cost can be
+# measured. Times include any dependencies which weren't already imported.
+def print_startup_profile():
+    ark.extensions.load_lazy_modules()
+    for name in commands:
+        if f"{__name__}.{name}" not in sys.modules:
+            _import_command(name)
+
+    ark.utils.termline()
+    ark.utils.safeprint("Startup profile:")
+    ark.utils.termline()
+    times = ark.extensions.import_times
+    for extension, module, seconds in times:
+        if module is None:
+            ark.utils.safeprint(f"{seconds * 1000:8.1f} ms   ·   {extension}")
+            for lazy_extension, lazy_module, lazy_seconds in times:
+                if lazy_extension == extension and lazy_module is not None:
+                    line = f"{lazy_seconds * 1000:8.1f} ms   ·   {extension}   "
+                    line += f"\u001B[90m{lazy_module} (lazy)\u001B[0m"
+                    ark.utils.safeprint(line)
+    ark.utils.termline()
@@ -5,6 +5,7 @@
 import os
 import sys
 import datetime
+import multiprocessing
 
 from .. import site
 from .. import events
@@ -12,6 +13,14 @@ from .. import utils
 from .. import nodes
 from .. import filters
 from .. import hashes
+from .. import deps
+from .. import rendercache
+from .. import writer
+from .. import profiler
+from .. import treecache
+from .. import manifest
+from .. import sync
+from .. import extensions
 
 
 helptext = """
@@ -24,12 +33,71 @@ Usage: ark build
   configuration file. It accepts either a theme name or an explicit path to a
   theme directory.
 
+  The --jobs option can be used to render pages in parallel using a pool of
+  worker processes. Workers are forked after the node tree and extensions have
+  been loaded. (Parallel builds require the 'fork' start method; on platforms
+  that don't support it pages are rendered serially.) Note that extensions
+  which accumulate state while rendering pages will only see the pages
+  rendered by their own worker process.
+
+  The --incremental flag tells Ark to record the inputs each page reads while
+  it's being rendered -- source files, include files, and configuration values.
+  On the next incremental build, pages whose inputs haven't changed are skipped.
+  Changes to the theme's templates, to extensions, or to the shape of the node
+  tree cause a full rebuild.
+
+  Rendered node content is cached on disk between builds. The cache is limited
+  to 256 MB by default; you can set a custom limit in MB via a
+  'render_cache_size' attribute in your site's configuration file. The
+  --no-render-cache flag bypasses the cache.
+
+  The --profile flag times each phase of writing each node and prints the
+  slowest nodes and templates at the end of the build. The --profile-json
+  option writes the full report to a JSON file. Timings are exclusive -- time
+  spent rendering a node's content is charged to that node even if the content
+  is rendered from another node's template.
+
+  The --low-memory flag tells Ark to release each node's text and rendered
+  HTML once its page has been written. Released data is reloaded on demand if
+  another page needs it. You can limit the number of nodes whose rendered HTML
+  is kept in memory at any one time via an 'html_cache_size' attribute in your
+  site's configuration file; in low-memory mode this defaults to 1000.
+
+  Ark records the files produced by each build. Files produced by the previous
+  build but not by the current one, e.g. the pages for deleted or renamed
+  nodes, are deleted from the output directory. Files which Ark didn't produce
+  are never deleted. Use the --no-prune flag to keep orphaned files.
+
+  Resource files are only copied if they've changed since the last build. If
+  the output directory is on the same filesystem as the site you can set a
+  'resource_sync_mode' attribute in your site's configuration file to
+  'hardlink' or 'reflink' to link files instead of copying them.
+
+  The --only option restricts the build to the subtree with the specified
+  @root/ url, e.g. '--only @root/blog//'. This option can be repeated. Only the
+  subtree and the directories and index files on the path to it are parsed, so
+  extensions which read other parts of the node tree (e.g. to build a site
+  menu) will only see this partial tree. The --incremental flag is ignored and
+  orphaned files aren't pruned for subtree builds.
+
 Options:
+  -j, --jobs <int>      Number of worker processes. Defaults to 1.
+  -o, --only <url>      Build only the subtree with the specified @root/ url.
+      --profile-json <path>
+                        Write a JSON profiling report to the specified file.
+      --profile-top <int>
+                        Number of nodes and templates to list in the profiling
+                        report. Defaults to 10.
   -t, --theme <name>    Override the default theme.
 
 Flags:
   -c, --clear           Clear the output directory before building.
   -h, --help            Print this command's help text and exit.
+  -i, --incremental     Skip pages whose inputs haven't changed.
+      --low-memory      Release node content after writing each page.
+      --no-prune        Don't delete files left over from previous builds.
+      --no-render-cache Don't use the render cache.
+  -p, --profile         Print a report of the slowest nodes and templates.
 """
 
 
@@ -37,7 +105,33 @@ Flags:
 def register_command(argparser):
     cmd_parser = argparser.command("build", helptext, cmd_callback)
     cmd_parser.flag("clear c")
+    cmd_parser.flag("incremental i")
+    cmd_parser.flag("low-memory")
+    cmd_parser.flag("no-prune")
+    cmd_parser.flag("no-render-cache")
+    cmd_parser.flag("profile p")
+    cmd_parser.option("profile-json")
+    cmd_parser.option("profile-top", type=int, default=10)
     cmd_parser.option("theme t")
+    cmd_parser.option("jobs j", type=int, default=1)
+    cmd_parser.option("only o")
+
+
+# Number of worker processes to use for rendering pages.
+jobs = 1
+
+
+# Number of entries to list in the profiling report. Zero for no report.
+profile_top = 0
+
+
+# Path for the JSON profiling report, if any.
+profile_json = None
+
+
+# Flat list of the nodes to be written by a parallel build. Worker processes
+# inherit this list when they're forked and receive ranges of indices into it.
+_queue = []
 
 
 def cmd_callback(cmd_name, cmd_parser):
@@ -47,9 +141,45 @@ def cmd_callback(cmd_name, cmd_parser):
     if cmd_parser.found('theme'):
         site.config['theme'] = cmd_parser.value('theme')
 
+    if cmd_parser.value('jobs') < 1:
+        sys.exit("Error: the number of jobs must be a positive integer.")
+
+    global jobs
+    jobs = cmd_parser.value('jobs')
+
     if cmd_parser.found('clear'):
         utils.cleardir(site.out())
         hashes.clear()
+        deps.clear()
+        treecache.clear()
+        manifest.clear()
+        sync.clear()
+        rendercache.clear()
+
+    for url in cmd_parser.values('only'):
+        if not url.startswith('@root/'):
+            sys.exit(f"Error: '{url}' is not a @root/ url.")
+        nodes.only.append(url)
+
+    # Dependency records from a partial tree would be incomplete.
+    if cmd_parser.found('incremental') and not nodes.only:
+        deps.enabled = True
+
+    if cmd_parser.found('no-prune') or nodes.only:
+        manifest.prune = False
+
+    if cmd_parser.found('low-memory'):
+        nodes.low_memory = True
+
+    if cmd_parser.found('no-render-cache'):
+        rendercache.enabled = False
+
+    if cmd_parser.found('profile') or cmd_parser.found('profile-json'):
+        profiler.enabled = True
+
+    global profile_top, profile_json
+    profile_top = cmd_parser.value('profile-top') if cmd_parser.found('profile') else 0
+    profile_json = cmd_parser.value('profile-json')
 
     @events.register(events.Event.MAIN)
     def fire_build_events():
@@ -65,28 +195,146 @@ def build_site():
         theme_name = site.config['theme']
         sys.exit(f"Error: cannot locate the theme '{theme_name}'.")
 
-    # Copy the theme's resource files to the output directory.
-    if os.path.isdir(site.theme('resources')):
-        utils.copydir(site.theme('resources'), site.out())
+    # Compare the inputs shared by every page with the last incremental build.
+    if deps.enabled:
+        deps.prepare()
 
-    # Copy the site's resource files to the output directory.
-    if os.path.exists(site.res()):
-        utils.copydir(site.res(), site.out())
+    # Parallel builds need to fork their worker processes before we start any
+    # threads.
+    subtrees = get_subtrees()
+    pool = None
+    if jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        pool = start_workers(subtrees, jobs)
 
-    # This callback writes an individual node to disk.
-    def write_node(node):
-        # A `disable` flag in a node's metadata header will prevent Ark from
-        # producing an output HTML page for the node.
-        if node.get('disable'):
-            return
+    # Copy the resource files on the writer pool while the pages render.
+    writer.start()
+    writer.submit(copy_resources)
 
-        # The `build_node` filter can be used as a switch to decide if a node
-        # should be written to disk.
-        if filters.apply('build_node', True, node):
+    # Walk the node tree and pass each node to the handler.
+    if pool:
+        write_parallel(pool, jobs)
+    else:
+        for subtree in subtrees:
+            for node in subtree.postorder():
+                write_node(node)
+
+    # Wait for the writer pool to finish.
+    writer.finish()
+
+
+# Returns the list of subtrees to write. This is the root node unless the
+# build has been restricted using the --only option.
+def get_subtrees() -> list[nodes.Node]:
+    if not nodes.only:
+        return [nodes.root()]
+
+    subtrees = []
+    for url in nodes.only:
+        if (node := nodes.node(url)) is None:
+            sys.exit(f"Error: cannot locate the node '{url}'.")
+        subtrees.append(node)
+
+    # Drop any subtree which is contained in another.
+    subtrees.sort(key=lambda node: len(node.path))
+    result = []
+    for node in subtrees:
+        if not any(node.path[:len(other.path)] == other.path for other in result):
+            result.append(node)
+    return result
+
+
+# Copies the theme's resource files and then the site's resource files to the
+# output directory.
+def copy_resources():
+    srcdirs = [site.theme('resources'), site.res()]
+    mode = site.config.get('resource_sync_mode', 'copy')
+    outputs = sync.sync([d for d in srcdirs if os.path.isdir(d)], site.out(), mode)
+    manifest.add_relpaths(outputs)
+
+
+# This callback writes an individual node to disk.
+def write_node(node):
+    # A `disable` flag in a node's metadata header will prevent Ark from
+    # producing an output HTML page for the node.
+    if node.get('disable'):
+        return
+
+    # The `build_node` filter can be used as a switch to decide if a node
+    # should be written to disk.
+    if filters.apply('build_node', True, node):
+        if deps.is_fresh(node.get_output_filepath()):
+            manifest.add(node.get_output_filepath())
+            site.pages_skipped(1)
+        else:
             node.write()
 
-    # Walk the node tree and pass each node to the handler.
-    nodes.root().walk(write_node)
+
+# Forks a pool of worker processes for writing the node tree. Each worker
+# inherits a copy of the fully-loaded node tree and extensions so we only need
+# to send it indices into the node queue. Each worker runs its own writer pool.
+def start_workers(subtrees, num_workers):
+    global _queue
+    _queue = []
+    for subtree in subtrees:
+        _queue.extend(subtree.postorder())
+
+    # List the includes once here so the workers inherit the index. Includes
+    # are rendered on first use and cached on disk.
+    site.includes()
+
+    # Import any lazily-imported extension libraries before forking so each
+    # worker doesn't import them separately.
+    extensions.load_lazy_modules()
+
+    context = multiprocessing.get_context('fork')
+    return context.Pool(num_workers, initializer=writer.start)
+
+
+# Writes the node tree using the worker pool. Page counts, hashes, dependency
+# records, and output files from the workers are merged back into the parent
+# process.
+def write_parallel(pool, num_workers):
+    # Small chunks balance the load, large chunks reduce the IPC overhead.
+    size = max(1, min(64, len(_queue) // (num_workers * 8)))
+    chunks = [range(i, min(i + size, len(_queue))) for i in range(0, len(_queue), size)]
+
+    with pool:
+        for result in pool.imap_unordered(_write_chunk, chunks):
+            if 'exit' in result:
+                pool.terminate()
+                sys.exit(result['exit'])
+            site.pages_rendered(result['rendered'])
+            site.pages_written(result['written'])
+            site.pages_skipped(result['skipped'])
+            hashes.merge(result['hashes'])
+            deps.merge(result['deps'])
+            profiler.merge(result['profile'])
+            manifest.merge(result['outputs'])
+            rendercache.merge(result['render_cache'])
+
+
+# Writes a chunk of nodes from the queue. This function runs in a worker
+# process. A worker that calls sys.exit() would leave the pool waiting on its
+# task forever so we catch the exit and report it to the parent instead.
+def _write_chunk(indices):
+    rendered, written = site.pages_rendered(), site.pages_written()
+    skipped = site.pages_skipped()
+    try:
+        for index in indices:
+            write_node(_queue[index])
+        writer.flush()
+    except SystemExit as err:
+        return {'exit': err.code}
+    return {
+        'rendered': site.pages_rendered() - rendered,
+        'written': site.pages_written() - written,
+        'skipped': site.pages_skipped() - skipped,
+        'hashes': hashes.pop_updates(),
+        'deps': deps.pop_updates(),
+        'profile': profiler.pop_updates(),
+        'outputs': manifest.pop_updates(),
+        'render_cache': rendercache.pop_updates(),
+    }
 
 
 @events.register(events.Event.EXIT_BUILD)
@@ -94,6 +342,16 @@ def print_build_stats():
     report = datetime.datetime.now().strftime("[%H:%M:%S]")
     report += f"   ·   Rendered: {site.pages_rendered():5d}"
     report += f"   ·   Written: {site.pages_written():5d}"
+    if deps.enabled:
+        report += f"   ·   Skipped: {site.pages_skipped():5d}"
     report += f"   ·   Time: {site.runtime():6.2f} sec"
     report = report.replace('·', '\u001B[90m·\u001B[0m')
     utils.safeprint(report)
+
+
+@events.register(events.Event.EXIT_BUILD)
+def print_profile():
+    if profile_top > 0:
+        profiler.print_report(profile_top)
+    if profile_json:
+        profiler.write_json(profile_json)
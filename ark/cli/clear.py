@@ -9,6 +9,11 @@ from .. import site
 from .. import utils
 from .. import events
 from .. import hashes
+from .. import deps
+from .. import treecache
+from .. import manifest
+from .. import rendercache
+from .. import sync
 
 
 helptext = """
@@ -35,4 +40,9 @@ def cmd_callback(cmd_name, cmd_parser):
 
     utils.cleardir(site.out())
     hashes.clear()
+    deps.clear()
+    treecache.clear()
+    manifest.clear()
+    sync.clear()
+    rendercache.clear()
     sys.exit()
@@ -60,13 +60,14 @@ def cmd_callback(cmd_name, cmd_parser):
 
 
 def treestring(node, depth, base, attrs):
-    if base == 'url':
-        line = '·  ' * depth + node.url
-    else:
-        line = '·  ' * depth + node.slug or '/'
-    for attr in attrs:
-        line += '  \u001B[90m--\u001B[0m  ' + repr(node.get(attr))
-    lines = [line]
-    for child in sorted(node.children, key=lambda node: node.slug):
-        lines.append(treestring(child, depth + 1, base, attrs))
+    lines = []
+    for child, child_depth in node.preorder(key=lambda node: node.slug, depths=True):
+        indent = '·  ' * (depth + child_depth)
+        if base == 'url':
+            line = indent + child.url
+        else:
+            line = indent + child.slug or '/'
+        for attr in attrs:
+            line += '  \u001B[90m--\u001B[0m  ' + repr(child.get(attr))
+        lines.append(line)
     return '\n'.join(lines)
@@ -23,12 +23,14 @@ Usage: ark watch
   The test server is automatically launched to view the site.
 
 Options:
+  -o, --only <url>      Build only the subtree with the specified @root/ url.
   -p, --port <int>      Port number to serve on. Defaults to 8080.
   -t, --theme <name>    Override the default theme.
 
 Flags:
   -c, --clear           Clear the output directory before each build.
   -h, --help            Print this command's help text and exit.
+  -i, --incremental     Skip pages whose inputs haven't changed.
 """
 
 
@@ -36,8 +38,10 @@ Flags:
 def register_command(argparser):
     cmd_parser = argparser.command("watch", helptext, cmd_callback)
     cmd_parser.flag("clear c")
+    cmd_parser.flag("incremental i")
     cmd_parser.option("theme t")
     cmd_parser.option("port p", type=int, default=8080)
+    cmd_parser.option("only o")
 
 
 # Callback for the watch command. Python doesn't have a builtin file system
@@ -67,6 +71,10 @@ def cmd_callback(cmd_name, cmd_parser):
         args += ['--theme', cmd_parser.value('theme')]
     if cmd_parser.found('clear'):
         args += ['--clear']
+    if cmd_parser.found('incremental'):
+        args += ['--incremental']
+    for url in cmd_parser.values('only'):
+        args += ['--only', url]
 
     # Print a header showing the site location.
     utils.termline()
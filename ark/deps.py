@@ -0,0 +1,305 @@
+# ------------------------------------------------------------------------------
+# This module handles dependency tracking for incremental builds.
+#
+# While a page is being rendered we record the inputs it reads: its own source
+# file, the source files of any other nodes it reads, files from the `inc`
+# directory, and site configuration values. These records are cached between
+# build runs. On the next run a page whose recorded inputs are all unchanged
+# is skipped entirely.
+#
+# Some inputs can affect every page: the theme's templates, extension code,
+# the shape of the node tree, and configuration values read outside of page
+# rendering. These are combined into a single build fingerprint; if the
+# fingerprint changes, every page is rebuilt.
+#
+# Extensions which cache data derived from other nodes across pages (e.g. a
+# site menu) should call `add_tree()` each time they use that data. The page
+# will then be rebuilt whenever any node in the tree changes.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import hashlib
+import pickle
+
+from . import __version__
+from . import site
+from . import nodes
+from . import events
+
+
+# True if incremental builds are enabled.
+enabled = False
+
+
+# Dependency records from the last build run, indexed by output filepath
+# relative to the output directory.
+_records = {}
+
+
+# Fingerprint and global configuration digests from the last build run.
+_global = {}
+
+
+# Dependency records for the current build run.
+_new = {}
+
+
+# Stack of dependency records being assembled. The record at the bottom
+# belongs to the page currently being rendered; nested records capture the
+# dependencies of data that's generated once and shared by many pages.
+_stack = []
+
+
+# Configuration keys read outside of page rendering. These affect every page.
+_global_config = set()
+
+
+# Fingerprint of the inputs shared by every page in the current build run.
+_fingerprint = None
+
+
+# True if the current fingerprint matches the last build run's.
+_fresh_build = None
+
+
+# Caches file signatures for the current build run.
+_signatures = {}
+
+
+# Marks configuration keys which don't exist.
+_missing = object()
+
+
+# Starts recording the dependencies of the page being written to `filepath`.
+def begin(filepath: str):
+    if enabled:
+        _stack.clear()
+        _stack.append(_new_record())
+        _stack[-1]['key'] = os.path.relpath(filepath, site.out())
+
+
+# Stops recording and stores the dependency record for the current page.
+def end():
+    if _stack:
+        record = _stack.pop()
+        _new[record['key']] = {
+            'files': {path: _signature(path) for path in record['files']},
+            'config': {key: _config_digest(key) for key in record['config']},
+            'tree': record['tree'],
+        }
+
+
+# Starts a nested record. Use this to capture the dependencies of data which
+# will be cached and shared by many pages.
+def push():
+    if enabled:
+        _stack.append(_new_record())
+
+
+# Ends a nested record and returns it. The record can be added to each page
+# which uses the shared data via add_record().
+def pop() -> dict|None:
+    if enabled:
+        return _stack.pop()
+    return None
+
+
+# Adds the dependencies in a record returned by pop() to the current record.
+def add_record(record: dict|None):
+    if _stack and record:
+        _stack[-1]['files'].update(record['files'])
+        _stack[-1]['config'].update(record['config'])
+        _stack[-1]['tree'] = _stack[-1]['tree'] or record['tree']
+
+
+# Records a dependency on a file.
+def add_file(path):
+    if _stack:
+        _stack[-1]['files'].add(str(path))
+
+
+# Records a dependency on a node's source file.
+def add_node(node):
+    if _stack and node.ext:
+        _stack[-1]['files'].add(node.filepath)
+
+
+# Records a dependency on a site configuration value.
+def add_config(key: str):
+    if _stack:
+        _stack[-1]['config'].add(key)
+    else:
+        _global_config.add(key)
+
+
+# Records a dependency on every node in the tree.
+def add_tree():
+    if _stack:
+        _stack[-1]['tree'] = True
+
+
+# Returns true if the page at `filepath` exists and none of the inputs it read
+# during the last build run have changed. If so, its dependency record is
+# carried forward to the next run.
+def is_fresh(filepath: str) -> bool:
+    if not enabled or not prepare():
+        return False
+
+    key = os.path.relpath(filepath, site.out())
+    record = _records.get(key)
+    if record is None or not os.path.isfile(filepath):
+        return False
+
+    if record['tree'] and _global['fingerprint']['nodes'] != _fingerprint['nodes']:
+        return False
+
+    for path, signature in record['files'].items():
+        if _signature(path) != signature:
+            return False
+
+    for config_key, digest in record['config'].items():
+        if _config_digest(config_key) != digest:
+            return False
+
+    _new[key] = record
+    return True
+
+
+# Computes the current build fingerprint and compares it with the last build
+# run's. Returns true if pages can be skipped. Parallel builds call this before
+# forking so the workers don't each repeat the work.
+def prepare() -> bool:
+    global _fingerprint, _fresh_build
+    if _fresh_build is None:
+        _fingerprint = _get_fingerprint()
+        _fresh_build = bool(_global)
+        if _fresh_build:
+            old = _global['fingerprint']
+            for name in ('version', 'theme', 'files', 'tree'):
+                if old.get(name) != _fingerprint[name]:
+                    _fresh_build = False
+            for key, digest in _global['config'].items():
+                if _config_digest(key) != digest:
+                    _fresh_build = False
+    return _fresh_build
+
+
+# Returns the dependency records added since the last call to this function
+# and resets the record. Parallel builds use this to collect the records
+# created by worker processes.
+def pop_updates() -> dict:
+    global _new
+    updates, _new = _new, {}
+    return updates
+
+
+# Merges a dictionary of records returned by pop_updates().
+def merge(updates: dict):
+    _new.update(updates)
+
+
+# Clear the records and delete any existing cache file.
+def clear():
+    _records.clear()
+    _global.clear()
+    if os.path.isfile(_cachefile()):
+        os.remove(_cachefile())
+
+
+# Returns a new, empty dependency record.
+def _new_record() -> dict:
+    return {'files': set(), 'config': set(), 'tree': False}
+
+
+# Returns the (mtime, size) signature of a file or None if it doesn't exist.
+def _signature(path: str):
+    if path not in _signatures:
+        try:
+            stat = os.stat(path)
+            _signatures[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            _signatures[path] = None
+    return _signatures[path]
+
+
+# Returns a digest of the current value of a site configuration key. This
+# bypasses the config dictionary's own tracking.
+def _config_digest(key: str) -> str:
+    value = dict.get(site.config, key, _missing)
+    if value is _missing:
+        return ''
+    return hashlib.sha1(repr(value).encode()).hexdigest()
+
+
+# Assembles the fingerprint of the inputs shared by every page.
+def _get_fingerprint() -> dict:
+    tree_hash = hashlib.sha1()
+    nodes_hash = hashlib.sha1()
+    for node in nodes.root().postorder():
+        tree_hash.update(f"{node.url}\t{node.filepath}\n".encode())
+        if node.ext:
+            nodes_hash.update(f"{node.filepath}\t{_signature(node.filepath)}\n".encode())
+
+    return {
+        'version': __version__,
+        'theme': site.theme(),
+        'files': {path: _signature(path) for path in _get_shared_files()},
+        'tree': tree_hash.hexdigest(),
+        'nodes': nodes_hash.hexdigest(),
+    }
+
+
+# Returns a list of the theme template files and extension source files.
+def _get_shared_files() -> list[str]:
+    paths = []
+    for dirpath in (site.theme('templates'), site.theme('extensions'), site.ext()):
+        if os.path.isdir(dirpath):
+            for parent, dirnames, filenames in os.walk(dirpath):
+                dirnames[:] = sorted(n for n in dirnames if n != '__pycache__')
+                paths.extend(os.path.join(parent, name) for name in sorted(filenames))
+    for name in site.config.get('extensions', []):
+        if path := getattr(sys.modules.get(name), '__file__', None):
+            paths.append(path)
+    return paths
+
+
+# Returns the name of the cache file for the current site.
+def _cachefile() -> str:
+    return site.cachefile('.deps.pickle')
+
+
+# Load the dependency records from the last build run. An unreadable cache
+# file is treated as empty so every page is rebuilt.
+@events.register(events.Event.INIT_BUILD)
+def _load():
+    if enabled and os.path.isfile(_cachefile()):
+        try:
+            with open(_cachefile(), 'rb') as file:
+                data = pickle.load(file)
+            pages, records = data['pages'], data['global']
+        except Exception:
+            return
+        _records.update(pages)
+        _global.update(records)
+
+
+# Cache the dependency records for the next build run.
+@events.register(events.Event.EXIT_BUILD)
+def _save():
+    if enabled:
+        if _fingerprint is None:
+            prepare()
+        data = {
+            'global': {
+                'fingerprint': _fingerprint,
+                'config': {key: _config_digest(key) for key in _global_config},
+            },
+            'pages': _new,
+        }
+        path = _cachefile()
+        temp = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp, 'wb') as file:
+            pickle.dump(data, file)
+        os.replace(temp, path)
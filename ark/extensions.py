@@ -5,25 +5,119 @@
 
 import os
 import sys
+import time
+import threading
 import importlib
+import importlib.util
 from . import site
 
 
+# Import times for the startup profile. Each entry is a tuple of (extension
+# name, module name, seconds). For an extension's own module the module name
+# is None.
+import_times = []
+
+
+# Name of the extension currently being loaded.
+_loading = None
+
+
+# Modules registered via lazy_import().
+_lazy_modules = []
+
+
+# Serializes the first use of lazily-imported modules, which may happen on
+# several threads at once.
+_lock = threading.Lock()
+
+
+# A placeholder for a module which is imported the first time one of its
+# attributes is accessed. Created by lazy_import().
+class LazyModule:
+
+    def __init__(self, name: str, extension: str|None):
+        self._name = name
+        self._extension = extension
+        self._module = None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    # Attributes set on the placeholder are set on the module itself, e.g.
+    # module-level configuration like `ibis.loader`.
+    def __setattr__(self, attr, value):
+        if attr in ('_name', '_extension', '_module'):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self.load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self.load(), attr)
+
+    # Imports the module if it hasn't already been imported and returns it.
+    def load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    import_times.append((self._extension, self._name, time.perf_counter() - start))
+                    self._module = module
+        return self._module
+
+
+# Returns a placeholder for the named module which imports it on first use, or
+# None if the module isn't installed. Extensions can use this for expensive
+# optional dependencies, e.g. rendering libraries, so that commands which
+# don't need them don't pay the cost of importing them.
+def lazy_import(name: str) -> LazyModule|None:
+    if name in sys.modules:
+        module = LazyModule(name, _loading)
+        module._module = sys.modules[name]
+        return module
+    try:
+        if importlib.util.find_spec(name) is None:
+            return None
+    except (ImportError, ValueError):
+        return None
+    module = LazyModule(name, _loading)
+    _lazy_modules.append(module)
+    return module
+
+
+# Imports every module registered via lazy_import() which hasn't been used yet.
+def load_lazy_modules():
+    for module in _lazy_modules:
+        module.load()
+
+
 # Load the named Python module from the specified directory.
 def load_module(dirpath: str, name: str):
     sys.path.insert(0, dirpath)
 
     try:
-        importlib.import_module(name)
+        _import(name)
     except Exception as e:
         raise Exception(f"Failed to load extension {name}: {e}") from e
 
     sys.path.pop(0)
 
+
+# Imports an extension module and records the time taken.
+def _import(name: str):
+    global _loading
+    _loading = name
+    start = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    finally:
+        _loading = None
+    import_times.append((name, None, time.perf_counter() - start))
+
 # Load a directory of Python modules.
 def load_directory(dirpath: str):
     for name in os.listdir(dirpath):
-        if name.startswith('.'):
+        if name.startswith('.') or name == '__pycache__':
             continue
         path = os.path.join(dirpath, name)
         if os.path.isfile(path):
@@ -48,7 +142,7 @@ def load_site_extensions():
 # Load installed extensions listed in the site's configuration file.
 def load_installed_extensions():
     for name in site.config.get('extensions', []):
-        importlib.import_module(name)
+        _import(name)
 
 
 # Load extensions bundled with the active theme.
@@ -21,13 +21,30 @@ import ark
 cached_menu = None
 
 
+# The menu with its @root/ urls resolved, indexed by page depth.
+resolved_menus = {}
+
+
+# The menu depends on every node in the tree. We only report that dependency
+# if the menu is actually output by the page's template.
+class Menu(str):
+    def __str__(self):
+        ark.deps.add_tree()
+        return str.__str__(self)
+
+
 # Register a callback to add an 'automenu' attribute to each page-data dictionary.
 @ark.events.register(ark.events.Event.RENDER_PAGE)
 def add_automenu(page_data):
     global cached_menu
     if cached_menu is None:
-        cached_menu = make_menu()
-    page_data['automenu'] = cached_menu
+        ark.deps.push()
+        cached_menu = Menu(make_menu())
+        ark.deps.pop()
+    depth = ark.utils.url_depth(page_data['filepath'])
+    if depth not in resolved_menus:
+        resolved_menus[depth] = Menu(ark.utils.resolve_urls(cached_menu, depth))
+    page_data['automenu'] = resolved_menus[depth]
 
 
 # This function's arguments are experimental and subject to change.
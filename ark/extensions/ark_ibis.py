@@ -2,17 +2,26 @@
 
 import ark
 
-try:
-    import ibis
-except ImportError:
-    ibis = None
+ibis = ark.extensions.lazy_import('ibis')
+
+# Path to the theme's template directory.
+template_dir = None
+
+# We create the template loader the first time a template is rendered.
+loader = None
 
 if ibis:
     @ark.events.register(ark.events.Event.INIT)
     def initalize_template_loader():
-        ibis.loader = ibis.loaders.FileLoader(ark.site.theme('templates'))
+        global template_dir, loader
+        template_dir = ark.site.theme('templates')
+        loader = None
 
     @ark.templates.register('ibis')
     def render_page(page_data, template_filename):
-        template = ibis.loader(template_filename)
+        global loader
+        if loader is None:
+            loader = ibis.loaders.FileLoader(template_dir)
+            ibis.load().loader = loader
+        template = loader(template_filename)
         return template.render(page_data)
@@ -2,24 +2,31 @@
 
 import ark
 
-try:
-    import jinja2
-except ImportError:
-    jinja2 = None
+jinja2 = ark.extensions.lazy_import('jinja2')
 
+# Path to the theme's template directory and the user's custom settings.
+template_dir = None
+jinja_settings = {}
+
+# We create the environment the first time a template is rendered.
 jinja_environment = None
 
 if jinja2:
     @ark.events.register(ark.events.Event.INIT)
     def initialize_jinja_environment():
-        settings = {
-            'loader': jinja2.FileSystemLoader(ark.site.theme('templates'))
-        }
-        settings.update(ark.site.config.get('jinja_settings', {}))
-        global jinja_environment
-        jinja_environment = jinja2.Environment(**settings)
+        global template_dir, jinja_settings, jinja_environment
+        template_dir = ark.site.theme('templates')
+        jinja_settings = ark.site.config.get('jinja_settings', {})
+        jinja_environment = None
 
     @ark.templates.register('jinja')
     def render_page(page_data, template_filename):
+        global jinja_environment
+        if jinja_environment is None:
+            settings = {
+                'loader': jinja2.FileSystemLoader(template_dir)
+            }
+            settings.update(jinja_settings)
+            jinja_environment = jinja2.Environment(**settings)
         template = jinja_environment.get_template(template_filename)
         return template.render(page_data)
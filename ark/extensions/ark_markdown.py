@@ -2,15 +2,17 @@
 
 import ark
 
-try:
-    import markdown
-except ImportError:
-    markdown = None
+markdown = ark.extensions.lazy_import('markdown')
+
+# We create the renderer the first time it's needed.
+renderer = None
 
 if markdown:
     settings = ark.site.config.get('markdown_settings') or {}
-    renderer = markdown.Markdown(**settings)
 
     @ark.renderers.register('md')
     def render_markdown(text):
+        global renderer
+        if renderer is None:
+            renderer = markdown.Markdown(**settings)
         return renderer.reset().convert(text)
@@ -3,10 +3,7 @@
 import ark
 import sys
 
-try:
-    import shortcodes
-except ImportError:
-    shortcodes = None
+shortcodes = ark.extensions.lazy_import('shortcodes')
 
 
 # We parse all shortcodes using this single Parser instance.
@@ -16,6 +13,12 @@ parser = None
 # The shortcodes package is an optional dependency.
 if shortcodes:
 
+    # The parser is shared by every page so its settings are a dependency of
+    # the whole build rather than of the first page to use it.
+    @ark.events.register(ark.events.Event.INIT_BUILD)
+    def record_shortcode_settings():
+        ark.deps.add_config('shortcode_settings')
+
     # We process and replace shortcodes in the node's text content just before
     # that text is rendered into HTML.
     @ark.filters.register(ark.filters.Filter.NODE_TEXT)
@@ -2,10 +2,7 @@
 
 import ark
 
-try:
-    import syntext
-except ImportError:
-    syntext = None
+syntext = ark.extensions.lazy_import('syntext')
 
 settings = ark.site.config.get('syntext_settings') or {'pygmentize': True}
 
@@ -3,13 +3,10 @@
 import ark
 import re
 
-try:
-    import yaml
-except ImportError:
-    yaml = None
+yaml = ark.extensions.lazy_import('yaml')
 
 if yaml:
-    @ark.filters.register(ark.filters.Filter.FILE_TEXT)
+    @ark.filters.register(ark.filters.Filter.FILE_TEXT, header_only=True)
     def parse_yaml_header(text, meta_dict):
         if text.startswith("---\n"):
             if match := re.match(r"^---\n(.*?\n)---\n", text, re.DOTALL):
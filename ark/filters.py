@@ -9,6 +9,15 @@ from enum import Enum, unique
 _callbacks = {}
 
 
+# Dictionary mapping hook names to the number of times their callbacks have
+# changed. Used to invalidate cached results, e.g. memoized slugs.
+_versions = {}
+
+
+# Set of (hook, callback) pairs for callbacks which only touch a file's header.
+_header_only = set()
+
+
 # Enumeration of available filters. String names are supposed for backward
 # compatibility.
 @unique
@@ -41,20 +50,31 @@ FILTER_NAMES = {member.value: member for member in Filter}
 #
 # The @register decorator accepts an optional order parameter with a default
 # integer value of 0. Callbacks with lower order fire first.
-def register(hook, order=0):
+#
+# Callbacks on the `file_text` hook can set `header_only` to true to declare
+# that they only read and modify a file's '---' delimited header. If every
+# callback on the hook is header-only, Ark passes them the header alone and
+# doesn't need to decode and copy the whole file to load it.
+def register(hook, order=0, header_only=False):
     hook = _hook_enum(hook)
 
     def register_callback(callback):
         _callbacks.setdefault(hook, {}).setdefault(order, []).append(callback)
+        _versions[hook] = _versions.get(hook, 0) + 1
+        if header_only:
+            _header_only.add((hook, callback))
         return callback
 
     return register_callback
 
 
 # Register a filter callback directly without using a decorator.
-def register_callback(hook, callback, order=0):
+def register_callback(hook, callback, order=0, header_only=False):
     hook = _hook_enum(hook)
     _callbacks.setdefault(hook, {}).setdefault(order, []).append(callback)
+    _versions[hook] = _versions.get(hook, 0) + 1
+    if header_only:
+        _header_only.add((hook, callback))
 
 
 # Fires a filter hook.
@@ -70,6 +90,7 @@ def apply(hook, value, *args):
 def clear(hook):
     hook = _hook_enum(hook)
     _callbacks[hook] = {}
+    _versions[hook] = _versions.get(hook, 0) + 1
 
 
 # Deregister a callback from a hook.
@@ -81,6 +102,23 @@ def deregister(hook, callback, order=None):
                 _callbacks[hook][order].remove(callback)
     elif order in _callbacks[hook] and callback in _callbacks[hook][order]:
         _callbacks[hook][order].remove(callback)
+    _versions[hook] = _versions.get(hook, 0) + 1
+
+
+# Returns true if every callback registered on a hook is header-only.
+def is_header_only(hook) -> bool:
+    hook = _hook_enum(hook)
+    for callbacks in _callbacks.get(hook, {}).values():
+        for callback in callbacks:
+            if (hook, callback) not in _header_only:
+                return False
+    return True
+
+
+# Returns a number which changes whenever the callbacks registered on a hook
+# change.
+def version(hook) -> int:
+    return _versions.get(_hook_enum(hook), 0)
 
 
 # Ensure that hook identifier is an Filter.
@@ -10,78 +10,177 @@
 #
 #   * We save on disk IO, which is more expensive than comparing hashes.
 #   * We avoid unnecessarily bumping the file modification time.
+#
+# Hashes are stored in an SQLite database along with the size and mtime of the
+# file that was written, so a file which has been modified or deleted since
+# the last build is detected with a single stat call. The database is opened
+# on first use and new hashes are committed in batches, so an interrupted
+# build loses at most one batch.
 # ------------------------------------------------------------------------------
 
 import os
+import sqlite3
 import hashlib
-import pickle
+import threading
 
 from . import site
 from . import events
 
 
-# Stores page-content hashes.
-_hashes = {}
+# Number of new hashes to collect before committing them to the database.
+batch_size = 1000
+
+
+# Database connection. Opened on first use.
+_db = None
+
+
+# ID of the process which opened the connection. Forked worker processes open
+# their own connections.
+_db_pid = None
+
+
+# ID of the process which owns the database. Worker processes don't write to
+# the database directly; their hashes are merged by the parent process.
+_owner_pid = os.getpid()
+
+
+# Hashes added since the last commit, indexed by output filepath relative to
+# the output directory. Each entry is a tuple of (digest, size, mtime_ns).
+_new = {}
+
 
+# Serializes access from writer threads.
+_lock = threading.Lock()
 
-# Update flag. True if we've added new hashes.
-_updated = False
 
+# Returns the digest of a page's encoded content.
+def digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
 
-# Stores the filepath for the cached-hashes file.
-_file = None
 
+# Encodes a page as UTF-8, using the platform's line endings as text-mode
+# writes would.
+def encode(content: str) -> bytes:
+    if os.linesep != '\n':
+        content = content.replace('\n', os.linesep)
+    return content.encode('utf-8')
 
-# Returns true if `filepath` is an existing file whose hash matches that of
-# the content string.
-def match(filepath: str, content: str) -> bool:
+
+# Returns true if `filepath` is an existing file which hasn't been modified
+# since it was written and whose content matches `content`. This can be either
+# the page's HTML string or a digest returned by digest().
+def match(filepath: str, content: str|bytes) -> bool:
+    page_digest = digest(encode(content)) if isinstance(content, str) else content
     key = os.path.relpath(filepath, site.out())
-    old_hash = _hashes.get(key)
-    new_hash = hashlib.sha1(content.encode()).hexdigest()
-    if new_hash == old_hash:
-        return os.path.exists(filepath)
-    else:
-        global _updated
-        _updated = True
-        _hashes[key] = new_hash
+    with _lock:
+        entry = _new.get(key) or _lookup(key)
+    if entry is None or entry[0] != page_digest:
+        return False
+    try:
+        stat = os.stat(filepath)
+    except OSError:
         return False
+    return (stat.st_size, stat.st_mtime_ns) == (entry[1], entry[2])
+
+
+# Records the digest of a file which has just been written.
+def update(filepath: str, page_digest: bytes):
+    key = os.path.relpath(filepath, site.out())
+    stat = os.stat(filepath)
+    with _lock:
+        _new[key] = (page_digest, stat.st_size, stat.st_mtime_ns)
+        if len(_new) >= batch_size and os.getpid() == _owner_pid:
+            _commit()
+
+
+# Returns the hashes added since the last call to this function and resets the
+# record. Parallel builds use this to collect the hashes recorded by worker
+# processes.
+def pop_updates() -> dict[str, tuple]:
+    global _new
+    with _lock:
+        updates, _new = _new, {}
+    return updates
+
+
+# Merges a dictionary of hashes returned by pop_updates().
+def merge(updates: dict[str, tuple]):
+    with _lock:
+        _new.update(updates)
+        if len(_new) >= batch_size:
+            _commit()
 
 
-# Clear the cache and delete any existing cache file.
+# Clear the cache and delete any existing database file.
 def clear():
-    _hashes.clear()
-    if os.path.isfile(_cachefile()):
-        os.remove(_cachefile())
-
-
-# Returns the name of the cache file for the curent site.
-def _cachefile() -> str:
-    global _file
-    if _file is None:
-        name = hashlib.sha1(site.home().encode()).hexdigest() + '.pickle'
-        if os.name == 'nt':
-            root = os.getenv('LOCALAPPDATA', os.path.expanduser('~'))
-            root = os.path.join(root, 'Ark')
-        else:
-            root = os.path.expanduser('~/.cache/ark')
-        _file = os.path.join(root, name)
-    return _file
-
-
-# Load cached page hashes from the last build run.
-@events.register(events.Event.INIT)
-def _load():
-    if os.path.isfile(_cachefile()):
-        with open(_cachefile(), 'rb') as file:
-            global _hashes
-            _hashes = pickle.load(file)
-
-
-# Cache page hashes to disk for the next build run.
+    global _db
+    with _lock:
+        _new.clear()
+        if _db is not None:
+            _db.close()
+            _db = None
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.isfile(_dbfile() + suffix):
+            os.remove(_dbfile() + suffix)
+
+
+# Returns the name of the database file for the current site.
+def _dbfile() -> str:
+    return site.cachefile('.hashes.sqlite')
+
+
+# Returns the database connection, opening it if necessary. The caller must
+# hold the lock.
+def _connect() -> sqlite3.Connection:
+    global _db, _db_pid
+    if _db is None or _db_pid != os.getpid():
+        os.makedirs(os.path.dirname(_dbfile()), exist_ok=True)
+        _db = sqlite3.connect(_dbfile(), check_same_thread=False)
+        _db_pid = os.getpid()
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS pages "
+            "(path TEXT PRIMARY KEY, digest BLOB, size INTEGER, mtime_ns INTEGER)"
+        )
+        _db.commit()
+        _remove_legacy_cache()
+    return _db
+
+
+# Returns the stored (digest, size, mtime_ns) tuple for a page or None. The
+# caller must hold the lock.
+def _lookup(key: str) -> tuple|None:
+    sql = "SELECT digest, size, mtime_ns FROM pages WHERE path = ?"
+    return _connect().execute(sql, (key,)).fetchone()
+
+
+# Commits new hashes to the database. The caller must hold the lock.
+def _commit():
+    if _new:
+        db = _connect()
+        sql = "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)"
+        db.executemany(sql, ((key, *entry) for key, entry in _new.items()))
+        db.commit()
+        _new.clear()
+
+
+# Earlier versions of Ark stored hashes in a pickle file.
+def _remove_legacy_cache():
+    if os.path.isfile(site.cachefile('.pickle')):
+        os.remove(site.cachefile('.pickle'))
+
+
+# Commit any remaining hashes and close the database.
 @events.register(events.Event.EXIT)
 def _save():
-    if _updated:
-        if not os.path.isdir(os.path.dirname(_cachefile())):
-            os.makedirs(os.path.dirname(_cachefile()))
-        with open(_cachefile(), 'wb') as file:
-            pickle.dump(_hashes, file)
+    global _db
+    if os.getpid() != _owner_pid:
+        return
+    with _lock:
+        if _new:
+            _commit()
+        if _db is not None:
+            _db.close()
+            _db = None
@@ -0,0 +1,125 @@
+# ------------------------------------------------------------------------------
+# This module records the output files produced by each build so that files
+# left over from earlier builds can be removed.
+#
+# At the end of each build we compare the files it produced with the files
+# produced by the previous build. Files which the previous build produced but
+# the current build didn't -- e.g. the pages for nodes which have been deleted
+# or renamed -- are deleted from the output directory, along with any
+# directories left empty. Files which Ark didn't produce are never touched.
+# ------------------------------------------------------------------------------
+
+import os
+import threading
+
+from . import site
+from . import events
+
+
+# Set to false to keep orphaned files. The manifest then accumulates the
+# outputs of every build until the next pruning build.
+prune = True
+
+
+# Output files produced by the current build, relative to the output directory.
+_outputs = set()
+
+
+# Output files added since the last call to pop_updates().
+_new = set()
+
+
+# Serializes updates from writer threads.
+_lock = threading.Lock()
+
+
+# Records an output file produced by the current build. Files outside the
+# output directory are ignored.
+def add(filepath: str):
+    relpath = os.path.relpath(filepath, site.out())
+    if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+        return
+    with _lock:
+        _outputs.add(relpath)
+        _new.add(relpath)
+
+
+# Records a list of output files given relative to the output directory.
+def add_relpaths(relpaths: list[str]):
+    with _lock:
+        _outputs.update(relpaths)
+        _new.update(relpaths)
+
+
+# Returns the outputs added since the last call to this function and resets
+# the record. Parallel builds use this to collect the outputs recorded by
+# worker processes.
+def pop_updates() -> set[str]:
+    global _new
+    with _lock:
+        updates, _new = _new, set()
+    return updates
+
+
+# Merges a set of outputs returned by pop_updates().
+def merge(updates: set[str]):
+    with _lock:
+        _outputs.update(updates)
+
+
+# Delete any existing manifest file.
+def clear():
+    if os.path.isfile(_cachefile()):
+        os.remove(_cachefile())
+
+
+# Returns the name of the manifest file for the current site.
+def _cachefile() -> str:
+    return site.cachefile('.manifest')
+
+
+# Returns the outputs recorded by the previous build.
+def _load() -> set[str]:
+    try:
+        with open(_cachefile(), encoding='utf-8') as file:
+            return set(line for line in file.read().split('\n') if line)
+    except OSError:
+        return set()
+
+
+# Deletes orphaned files and any directories left empty.
+def _prune(orphans: set[str]):
+    dirpaths = set()
+    for relpath in orphans:
+        path = site.out(relpath)
+        if os.path.isfile(path):
+            os.remove(path)
+            dirpaths.add(os.path.dirname(path))
+
+    # Remove empty directories, deepest first, stopping at the output directory.
+    root = os.path.abspath(site.out())
+    while dirpaths:
+        dirpath = max(dirpaths, key=len)
+        dirpaths.remove(dirpath)
+        dirpath = os.path.abspath(dirpath)
+        if dirpath.startswith(root + os.sep) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+            dirpaths.add(os.path.dirname(dirpath))
+
+
+# Prunes orphaned files and saves the manifest for the next build.
+@events.register(events.Event.EXIT_BUILD)
+def _save():
+    old = _load()
+    if prune:
+        _prune(old - _outputs)
+        outputs = _outputs
+    else:
+        outputs = old | _outputs
+
+    path = _cachefile()
+    temp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(temp, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(sorted(outputs)))
+    os.replace(temp, path)
@@ -13,20 +13,71 @@ from pathlib import Path
 
 import os
 import sys
+import bisect
+import datetime
+import functools
+import collections
+import concurrent.futures
 
 from . import utils
 from . import events
 from . import filters
-from . import renderers
 from . import site
 from . import templates
-from . import hashes
+from . import writer
+from . import deps
+from . import rendercache
+from . import profiler
+from . import treecache
 
 
 # Cached tree of Node instances.
 _root = None
 
 
+# List of @root/ urls. If not empty, only the subtrees with these urls are
+# parsed, along with the directories and index files on the path from the root
+# node to each subtree. (These ancestors are needed for Node.inherit().)
+only: list[str] = []
+
+
+# Set to true to release each node's text and rendered HTML once the node has
+# been written. Released data is reloaded on demand.
+low_memory = False
+
+
+# Maximum number of nodes whose rendered HTML is kept in memory. Zero for no
+# limit. Set at the start of each build from the site's configuration.
+html_cache_size = 0
+
+
+# Number of threads used to scan the source directory.
+scan_threads = 8
+
+
+# True if node text is loaded on demand. Set from the site's configuration
+# when the tree is parsed.
+_lazy_text = True
+
+
+# Metadata query indexes, indexed by key.
+_indexes = {}
+
+
+# Maps each metadata key to a count of writes via dictionary-style access.
+# A query index built for an older version of its key is rebuilt.
+_meta_versions: dict[str, int] = {}
+
+
+# Marks missing metadata values.
+_missing = object()
+
+
+# Nodes with cached HTML in least-recently-used order. Only used when
+# `html_cache_size` is set.
+_html_nodes = collections.OrderedDict()
+
+
 # Returns the site's root node. Parses the root directory and assembles the
 # node tree when first called.
 def root() -> Node:
@@ -34,8 +85,13 @@ def root() -> Node:
     if _root is None:
         if not os.path.isdir(site.src()):
             sys.exit("Error: cannot locate the site's source directory.")
+        # Text can only be loaded lazily if every `file_text` filter has
+        # declared that it only reads the header.
+        global _lazy_text
+        _lazy_text = site.config.get('lazy_load_text', True) and filters.is_header_only('file_text')
         _root = Node()
         _parse_node_directory(_root, site.src())
+        treecache.save(partial=bool(only))
     return _root
 
 
@@ -46,11 +102,147 @@ def node(url: str) -> Node|None:
         node = root()
         for slug in url.rstrip('/').split('/')[1:]:
             if (node := node.child(slug)) is None:
-                break
+                return None
         return node
     return None
 
 
+# Returns an index of the nodes in the tree with the specified metadata key.
+# Indexes are built on first use and shared by every page. Pages which run
+# queries depend on the whole tree for incremental builds.
+#
+# >>> posts = query('tags').has('python')
+# >>> recent = query('date').range(start=datetime.date(2024, 1, 1))
+#
+# An index is rebuilt automatically if its key is set via dictionary-style
+# access. Call reindex() after adding or removing nodes or after modifying
+# the [.meta] dictionary directly.
+def query(key: str) -> Index:
+    deps.add_tree()
+    index = _indexes.get(key)
+    if index is None or index.version != _meta_versions.get(key, 0):
+        index = _indexes[key] = Index(key)
+    return index
+
+
+# Discards all query indexes.
+def reindex():
+    _indexes.clear()
+
+
+# Provides template access to query indexes, e.g. {{ query.tags.has('python') }}.
+class Queries:
+
+    def __getitem__(self, key: str) -> Index:
+        return query(key)
+
+    def __call__(self, key: str) -> Index:
+        return query(key)
+
+
+# An index of the nodes with a particular metadata key. Lookups return lists
+# of nodes; nodes with equal values are listed in tree order.
+class Index:
+
+    def __init__(self, key: str):
+        self.key = key
+        self.version = _meta_versions.get(key, 0)
+
+        # Maps each hashable value to a list of nodes.
+        self._values: dict[Any, list[Node]] = {}
+
+        # Maps each element of a list, tuple, or set value to a list of nodes.
+        self._members: dict[Any, list[Node]] = {}
+
+        # Nodes with scalar values sorted by value, and their sort keys.
+        self._nodes: list[Node] = []
+        self._keys: list[Any] = []
+
+        entries = []
+        for node in root().postorder():
+            self._add(node, entries)
+        self._sort(entries)
+
+    # Returns the nodes whose value equals `value`.
+    def eq(self, value: Any) -> list[Node]:
+        try:
+            return list(self._values.get(value, []))
+        except TypeError:
+            return []
+
+    # Returns the nodes whose value is a list, tuple, or set containing `value`.
+    def has(self, value: Any) -> list[Node]:
+        try:
+            return list(self._members.get(value, []))
+        except TypeError:
+            return []
+
+    # Returns the nodes with values in the half-open range [start, end), in
+    # sorted order. Either bound can be None. Dates can be specified as ISO
+    # format strings.
+    def range(self, start: Any = None, end: Any = None) -> list[Node]:
+        lo = 0 if start is None else bisect.bisect_left(self._keys, self._bound(start))
+        hi = len(self._keys) if end is None else bisect.bisect_left(self._keys, self._bound(end))
+        return self._nodes[lo:hi]
+
+    # Returns the nodes with scalar values in sorted order.
+    def sorted(self, reverse: bool = False) -> list[Node]:
+        return self._nodes[::-1] if reverse else list(self._nodes)
+
+    # Returns the distinct values, and the distinct elements of list, tuple,
+    # and set values.
+    def values(self) -> list[Any]:
+        return list(self._values) + [v for v in self._members if v not in self._values]
+
+    def _add(self, node: Node, entries: list):
+        if (value := node.meta.get(self.key)) is None:
+            return
+        if isinstance(value, (list, tuple, set, frozenset)):
+            for item in value:
+                try:
+                    self._members.setdefault(item, []).append(node)
+                except TypeError:
+                    pass
+        elif not isinstance(value, dict):
+            entries.append((value, node))
+        try:
+            self._values.setdefault(value, []).append(node)
+        except TypeError:
+            pass
+
+    # Sorts the scalar values using the first sort key level that works.
+    def _sort(self, entries: list):
+        for self._level in range(3):
+            try:
+                keyed = [(_sort_key(v, self._level), n) for v, n in entries]
+                keyed.sort(key=lambda entry: entry[0])
+                break
+            except TypeError:
+                continue
+        self._keys = [key for key, _ in keyed]
+        self._nodes = [node for _, node in keyed]
+        self._dates = any(isinstance(_sort_key(v), datetime.datetime) for v, _ in entries)
+
+    # Converts a range bound to a sort key.
+    def _bound(self, value: Any) -> Any:
+        if isinstance(value, str) and self._dates:
+            value = datetime.datetime.fromisoformat(value)
+        return _sort_key(value, self._level)
+
+
+# Returns the sort key for a metadata value. Dates are converted to datetimes
+# so they can be compared with each other. At level 1 values are grouped by
+# type; at level 2 values of the same type are compared as strings.
+def _sort_key(value: Any, level: int = 0) -> Any:
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if level == 1:
+        return (type(value).__name__, value)
+    if level == 2:
+        return (type(value).__name__, str(value))
+    return value
+
+
 # A Node instance represents a directory or text file (or both) in the
 # site's source directory. You can treat a Node instance as a dictionary:
 #
@@ -59,9 +251,27 @@ def node(url: str) -> Node|None:
 # >>> bar = node['foo']
 #
 # Dictionary-style reads and writes are passed through to the node's [.meta]
-# dictionary.
+# dictionary. Reads are reported to the dependency tracker.
+#
+# Nodes use __slots__ to keep large trees compact. Extensions can still add
+# their own attributes as these are stored in a __dict__ created on demand,
+# and nodes can still be weakly referenced.
 class Node():
 
+    __slots__ = (
+        'meta',
+        'parent',
+        'children',
+        'filepath',
+        'stem',
+        'ext',
+        '_text',
+        '_reloadable',
+        '_cache',
+        '__dict__',
+        '__weakref__',
+    )
+
     def __init__(self):
         # Stores the node's metadata (title, author, date, etc.).
         self.meta: dict[str, Any] = {}
@@ -82,11 +292,15 @@ class Node():
         # Stores the node's filepath extension, stripped of its leading dot.
         self.ext: str = ''
 
-        # Stores the node's raw text content.
-        self.text: str = ''
+        # Stores the node's raw text content. None if the text hasn't been
+        # loaded yet or has been released.
+        self._text: str|None = ''
+
+        # True if the node's text is the unmodified content of its source file.
+        self._reloadable: bool = False
 
-        # Internal cache for generated data.
-        self.cache: dict[str, Any] = {}
+        # Internal cache for generated data. Created on first use.
+        self._cache: dict[str, Any]|None = None
 
     # Identifying nodes by their @root/ url is useful for debugging.
     def __repr__(self) -> str:
@@ -94,34 +308,158 @@ class Node():
 
     # Allows dictionary-style read access to the node's metadata.
     def __getitem__(self, key: str) -> Any:
+        deps.add_node(self)
         return self.meta[key]
 
     # Allows dictionary-style write access to the node's metadata.
     def __setitem__(self, key: str, value: Any):
+        _meta_versions[key] = _meta_versions.get(key, 0) + 1
         self.meta[key] = value
 
+        # Inherited values for this key may have changed for this node and its
+        # descendants.
+        for node in self.postorder():
+            if node._cache and (results := node._cache.get('inherit')):
+                results.pop(key, None)
+
     # Dictionary-style 'in' support for metadata.
     def __contains__(self, key: str) -> bool:
+        deps.add_node(self)
         return key in self.meta
 
     # Dictionary-style 'get' support for metadata.
     def get(self, key: str, default: Any = None) -> Any:
+        deps.add_node(self)
         return self.meta.get(key, default)
 
     # Dictionary-style 'get' with inheritance for metadata. This method walks
-    # its way up the ancestor chain looking for a matching entry.
+    # its way up the ancestor chain looking for a matching entry. Results are
+    # cached until the key is next set via dictionary-style access on the node
+    # or one of its ancestors. (Modifying a [.meta] dictionary directly doesn't
+    # clear the cache.)
     def inherit(self, key: str, default: Any = None) -> Any:
-        while self is not None:
-            if key in self.meta:
-                return self.meta[key]
-            self = self.parent
-        return default
-
-    # Calls the specified function on the node and all its descendants.
+        results = self.cache.setdefault('inherit', {})
+
+        if (result := results.get(key)) is None:
+            value, visited, node = _missing, [], self
+            while node is not None:
+                visited.append(node)
+                if key in node.meta:
+                    value = node.meta[key]
+                    break
+                node = node.parent
+            result = results[key] = (value, tuple(node for node in visited if node.ext))
+
+        # The page depends on every node file checked along the way.
+        if deps.enabled:
+            for node in result[1]:
+                deps.add_node(node)
+        return default if result[0] is _missing else result[0]
+
+    # Calls the specified function on the node and all its descendants. Nodes
+    # are visited in post-order, i.e. each node after its children.
     def walk(self, callback):
-        for node in self.children:
-            node.walk(callback)
-        callback(self)
+        for node in self.postorder():
+            callback(node)
+
+    # The following iterators yield the node and its descendants without
+    # recursion, so they're safe to use on very deep trees. They accept the
+    # following optional arguments:
+    #
+    #   predicate: only nodes for which this function returns true are
+    #              yielded. (Their descendants are still visited.)
+    #   max_depth: descendants more than this many levels below the node
+    #              are skipped. Zero yields only the node itself.
+    #   key:       sort function for each node's children. By default
+    #              children are visited in their natural order.
+    #   depths:    if true, yield (node, depth) tuples where depth is the
+    #              number of levels below the starting node.
+
+    # Yields nodes in pre-order, i.e. each node before its children.
+    def preorder(self, predicate=None, max_depth=None, key=None, depths=False):
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if predicate is None or predicate(node):
+                yield (node, depth) if depths else node
+            if max_depth is None or depth < max_depth:
+                children = sorted(node.children, key=key) if key else node.children
+                stack.extend((child, depth + 1) for child in reversed(children))
+
+    # Yields nodes in post-order, i.e. each node after its children.
+    def postorder(self, predicate=None, max_depth=None, key=None, depths=False):
+        stack = [(self, 0, None)]
+        while stack:
+            node, depth, children = stack[-1]
+            if children is None:
+                if max_depth is not None and depth >= max_depth:
+                    children = iter(())
+                else:
+                    children = iter(sorted(node.children, key=key) if key else node.children)
+                stack[-1] = (node, depth, children)
+            if (child := next(children, None)) is not None:
+                stack.append((child, depth + 1, None))
+                continue
+            stack.pop()
+            if predicate is None or predicate(node):
+                yield (node, depth) if depths else node
+
+    # Yields nodes in breadth-first order, i.e. level by level.
+    def breadthfirst(self, predicate=None, max_depth=None, key=None, depths=False):
+        queue = collections.deque([(self, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            if predicate is None or predicate(node):
+                yield (node, depth) if depths else node
+            if max_depth is None or depth < max_depth:
+                children = sorted(node.children, key=key) if key else node.children
+                queue.extend((child, depth + 1) for child in children)
+
+    # Returns the node's depth in the tree. The root node has depth 0.
+    @property
+    def depth(self) -> int:
+        depth, node = 0, self
+        while (node := node.parent) is not None:
+            depth += 1
+        return depth
+
+    # Returns the node's raw text content. Loads the text from the node's
+    # source file on first access or if it has been released. Metadata found
+    # in the body by `file_text` filters is merged into the node's metadata
+    # without overwriting existing keys.
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text, meta = utils.loadfile(self.filepath)
+            for key, value in _intern_keys(meta).items():
+                self.meta.setdefault(key, value)
+        return self._text
+
+    # Assigning text to a node prevents it from being released.
+    @text.setter
+    def text(self, value: str):
+        self._text = value
+        self._reloadable = False
+
+    # Internal cache for generated data.
+    @property
+    def cache(self) -> dict[str, Any]:
+        if self._cache is None:
+            self._cache = {}
+        return self._cache
+
+    @cache.setter
+    def cache(self, value: dict[str, Any]):
+        self._cache = value
+
+    # Releases the node's text and rendered HTML to save memory. Both will be
+    # regenerated if they're needed again.
+    def release(self):
+        if self._reloadable:
+            self._text = None
+        if self._cache:
+            self._cache.pop('html', None)
+        _html_nodes.pop(id(self), None)
 
     # Returns the node's path, i.e. the list of slugs which determines the node's
     # output filepath and url. (Returns a disposable copy of the cached list.)
@@ -159,7 +497,19 @@ class Node():
         return self.cache['slug']
 
     # Returns the child node with the specified slug if it exists, otherwise None.
+    # Lookups use an index of the node's children by slug. The index is rebuilt
+    # if the number of children changes; if it's out of date for some other
+    # reason we fall back on a linear search.
     def child(self, slug: str) -> Node|None:
+        count, index = self.cache.get('child_index', (-1, None))
+        if count != len(self.children):
+            index = {}
+            for child in self.children:
+                index.setdefault(child.slug, child)
+            self.cache['child_index'] = (len(self.children), index)
+        if (child := index.get(slug)) is not None:
+            if child.parent is self and child.slug == slug:
+                return child
         for child in self.children:
             if child.slug == slug:
                 return child
@@ -171,42 +521,68 @@ class Node():
     # template file.
     @property
     def html(self) -> str:
+        deps.add_node(self)
         if not 'html' in self.cache:
-            text = filters.apply('node_text', self.text, self)
-            html = renderers.render(text, self.ext, self.filepath)
-            self.cache['html'] = filters.apply('node_html', html, self)
+            with profiler.timer(self.url, 'node_text'):
+                text = filters.apply('node_text', self.text, self)
+            with profiler.timer(self.url, 'render'):
+                html = rendercache.render(text, self.ext, self.filepath)
+            with profiler.timer(self.url, 'node_html'):
+                self.cache['html'] = filters.apply('node_html', html, self)
+            if html_cache_size:
+                _html_nodes[id(self)] = self
+                while len(_html_nodes) > html_cache_size:
+                    _, node = _html_nodes.popitem(last=False)
+                    node.cache.pop('html', None)
+        elif html_cache_size and id(self) in _html_nodes:
+            _html_nodes.move_to_end(id(self))
         return self.cache['html']
 
     # Generates a HTML page for the node and writes that page to disk.
     def write(self):
         output_filepath = self.get_output_filepath()
 
+        # Record the inputs read while rendering the page.
+        deps.begin(output_filepath)
+        deps.add_node(self)
+
+        # Includes and links are resolved for the page's depth in the output
+        # directory so the final page rarely needs rewriting.
+        depth = utils.url_depth(output_filepath)
+
         # This data dictionary gets passed to the template engine.
         page_data = {
             'node': self,
             'site': site.config,
-            'inc': site.includes(),
+            'inc': site.includes(depth),
             'is_homepage': self.parent is None,
             'filepath': output_filepath,
             'classes': self.get_class_list(),
             'templates': self.get_template_list(),
+            'query': Queries(),
+            'link': functools.partial(utils.resolve_url, depth=depth),
         }
 
         # Generate a HTML page by pouring the node's content into a template.
-        events.fire(events.Event.RENDER_PAGE, page_data)
-        page_html = templates.render(page_data)
+        with profiler.timer(self.url, 'render_page'):
+            events.fire(events.Event.RENDER_PAGE, page_data)
+        with profiler.timer(self.url, 'template'):
+            page_html = templates.render(page_data)
         site.pages_rendered(1)
 
         # Filter the HTML before writing it to disk.
-        page_html = filters.apply('page_html', page_html, page_data)
+        with profiler.timer(self.url, 'page_html'):
+            page_html = filters.apply('page_html', page_html, page_data)
 
         # Rewrite all @root/ urls.
-        page_html = utils.rewrite_urls(page_html, output_filepath)
+        with profiler.timer(self.url, 'rewrite_urls'):
+            page_html = utils.rewrite_urls(page_html, output_filepath)
+        deps.end()
 
-        # Write the page to disk. Avoid overwriting identical files.
-        if not hashes.match(output_filepath, page_html):
-            utils.writefile(output_filepath, page_html)
-            site.pages_written(1)
+        # Hand the page off to the writer stage.
+        writer.write(output_filepath, page_html, self.url)
+        if low_memory:
+            self.release()
 
     # Returns the output filepath for the node.
     # Deprecated: site.config.get('extension'), replaced by site.config.get('file_extension').
@@ -252,31 +628,99 @@ class Node():
         return filters.apply('class_list', class_list, self)
 
 
-# Parse a source directory. The `load_node_dir` and `load_node_file` filters
-# can be used as switches to determine if a directory or file should be treated
-# as a node or ignored.
+# Reads the HTML cache limit from the site's configuration. In low-memory mode
+# the cache is limited to 1000 nodes by default.
+@events.register(events.Event.INIT_BUILD)
+def _init_html_cache():
+    global html_cache_size
+    default = 1000 if low_memory else 0
+    html_cache_size = site.config.get('html_cache_size', default)
+
+
+# Parse a source directory and its subdirectories. The `load_node_dir` and
+# `load_node_file` filters can be used as switches to determine if a directory
+# or file should be treated as a node or ignored.
+#
+# Directories are scanned concurrently on a pool of threads. Each directory is
+# scanned by a single thread so each node's children appear in the same order
+# as a serial scan would produce, but filter callbacks may run on any thread.
 #
 # Args:
 #   dir_node (Node): the Node instance for the directory.
 #   dir_path (str/Path): path to the directory as a string or Path instance.
 def _parse_node_directory(dir_node, dir_path):
-
-    # Parse subdirectories.
-    for subdir_path in (p for p in Path(dir_path).iterdir() if p.is_dir()):
+    if scan_threads <= 1:
+        stack = [(dir_node, dir_path)]
+        while stack:
+            stack.extend(_scan_node_directory(*stack.pop()))
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(scan_threads) as pool:
+        pending = {pool.submit(_scan_node_directory, dir_node, dir_path)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when='FIRST_COMPLETED')
+            for future in done:
+                for child_node, child_path in future.result():
+                    pending.add(pool.submit(_scan_node_directory, child_node, child_path))
+
+
+# Parse the files in a single source directory and create nodes for its
+# subdirectories. Returns a list of (node, path) tuples for the subdirectories
+# which still need to be parsed. The directory is read in a single pass and
+# the file type information cached by os.scandir() is reused.
+def _scan_node_directory(dir_node, dir_path) -> list[tuple[Node, Path]]:
+    scope = _get_scope(dir_path)
+    with os.scandir(dir_path) as iterator:
+        entries = list(iterator)
+
+    # Create nodes for subdirectories.
+    subdirs = []
+    for entry in (e for e in entries if e.is_dir()):
+        subdir_path = Path(entry.path)
+        if scope is not None and utils.slugify(subdir_path.stem) not in scope:
+            continue
         if filters.apply('load_node_dir', True, subdir_path):
             child_node = Node()
             child_node.stem = subdir_path.stem
             child_node.parent = dir_node
-            child_node.filepath = str(subdir_path)
+            child_node.filepath = entry.path
             dir_node.children.append(child_node)
-            _parse_node_directory(child_node, subdir_path)
-
-    # Parse files.
-    for file_path in (p for p in Path(dir_path).iterdir() if p.is_file()):
+            subdirs.append((child_node, subdir_path))
+
+    # Parse files. Files are matched to existing child nodes by stem.
+    stems = {}
+    for child in dir_node.children:
+        stems.setdefault(child.stem, child)
+    for entry in (e for e in entries if e.is_file()):
+        file_path = Path(entry.path)
         if file_path.stem.startswith('.') or file_path.stem.endswith('~'):
             continue
+        if scope is not None and file_path.stem != 'index':
+            if utils.slugify(file_path.stem) not in scope:
+                continue
         if filters.apply('load_node_file', True, file_path):
-            _parse_node_file(dir_node, file_path)
+            _parse_node_file(dir_node, file_path, stems)
+
+    return subdirs
+
+
+# Returns None if the entire directory should be parsed. Otherwise, i.e. if the
+# directory is an ancestor of the subtrees selected by `only`, returns the set
+# of child slugs which lead to those subtrees. Matching uses the slugified
+# directory and file names.
+def _get_scope(dir_path) -> set[str]|None:
+    if not only:
+        return None
+    parts = Path(dir_path).relative_to(site.src()).parts
+    slugs = utils.slugify_many(Path(part).stem for part in parts)
+    scope = set()
+    for url in only:
+        target = [slug for slug in url.removeprefix('@root/').split('/') if slug]
+        if slugs[:len(target)] == target:
+            return None
+        if target[:len(slugs)] == slugs:
+            scope.add(target[len(slugs)])
+    return scope
 
 
 # Parse a source file.
@@ -284,22 +728,46 @@ def _parse_node_directory(dir_node, dir_path):
 # Args:
 #   dir_node (Node): the Node instance for the directory containing the file.
 #   file_path (Path): path to the file as a Path instance.
-def _parse_node_file(dir_node, file_path):
+#   stems (dict): optional index of the directory's child nodes by stem.
+def _parse_node_file(dir_node, file_path, stems=None):
+    # A directory's own node file, e.g. `foo.md` for the directory `foo`, is
+    # parsed before the directory's `index` file. The node file takes
+    # precedence so its metadata is applied on top of the index file's. We
+    # know a node file has been parsed if the node has an extension set by a
+    # file outside this directory.
+    if file_path.stem == 'index' and dir_node.ext and Path(dir_node.filepath).parent != file_path.parent:
+        meta = treecache.loadheader(file_path) if _lazy_text else utils.loadfile(file_path)[1]
+        meta = _intern_keys(meta)
+        meta.update(dir_node.meta)
+        dir_node.meta = meta
+        return
+
     if file_path.stem == 'index':
         file_node = dir_node
     else:
-        file_node = None
-        for child in dir_node.children:
-            if file_path.stem == child.stem:
-                file_node = child
-                break
+        if stems is None:
+            stems = {}
+            for child in dir_node.children:
+                stems.setdefault(child.stem, child)
+        file_node = stems.get(file_path.stem)
         if file_node is None:
             file_node = Node()
             file_node.stem = file_path.stem
             file_node.parent = dir_node
             dir_node.children.append(file_node)
-    text, meta = utils.loadfile(file_path)
-    file_node.text = text
-    file_node.meta.update(meta)
+            stems[file_path.stem] = file_node
+    if _lazy_text:
+        file_node._text = None
+        meta = treecache.loadheader(file_path)
+    else:
+        file_node._text, meta = utils.loadfile(file_path)
+    file_node._reloadable = True
+    file_node.meta.update(_intern_keys(meta))
     file_node.filepath = str(file_path)
     file_node.ext = file_path.suffix.strip('.')
+
+
+# Returns a copy of a metadata dictionary with its string keys interned. Most
+# nodes share the same small set of keys so this saves memory on large sites.
+def _intern_keys(meta: dict) -> dict:
+    return {sys.intern(key) if type(key) is str else key: value for key, value in meta.items()}
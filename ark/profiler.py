@@ -0,0 +1,161 @@
+# ------------------------------------------------------------------------------
+# This module implements the build profiler.
+#
+# When profiling is enabled we time each phase of writing each node: the
+# `node_text` filters, the rendering engine, the `RENDER_PAGE` event handlers,
+# the template engine, the `page_html` filters, rewriting @root/ urls, and the
+# hash check and write. Timings are exclusive, i.e. time spent rendering one
+# node's content from inside another node's template is charged to the first
+# node's `render` phase rather than the second node's `template` phase.
+# ------------------------------------------------------------------------------
+
+import time
+import json
+import threading
+import contextlib
+
+from . import __version__
+from . import site
+from . import utils
+
+
+# Set to true to enable profiling.
+enabled = False
+
+
+# Maps node urls to dictionaries of phase timings in seconds.
+_nodes = {}
+
+
+# Maps node urls to the names of their template files.
+_templates = {}
+
+
+# Serializes updates from writer threads.
+_lock = threading.Lock()
+
+
+# Per-thread stack of active timers.
+_local = threading.local()
+
+
+# Returned by timer() when profiling is disabled.
+_null = contextlib.nullcontext()
+
+
+# Context manager which times a phase for a node.
+class Timer:
+
+    def __init__(self, url: str, phase: str):
+        self.url = url
+        self.phase = phase
+        self.nested = 0.0
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self.start
+        _local.stack.pop()
+        if _local.stack:
+            _local.stack[-1].nested += elapsed
+        add(self.url, self.phase, elapsed - self.nested)
+
+
+# Returns a context manager which times the specified phase for the node with
+# the specified url.
+def timer(url: str, phase: str):
+    if enabled:
+        return Timer(url, phase)
+    return _null
+
+
+# Adds a timing for a node.
+def add(url: str, phase: str, seconds: float):
+    with _lock:
+        phases = _nodes.setdefault(url, {})
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+# Records the name of the template file used for a node.
+def set_template(url: str, name: str):
+    if enabled:
+        _templates[url] = name
+
+
+# Returns the data recorded since the last call to this function and resets
+# the record. Parallel builds use this to collect the data recorded by worker
+# processes.
+def pop_updates() -> tuple[dict, dict]:
+    global _nodes, _templates
+    updates, _nodes, _templates = (_nodes, _templates), {}, {}
+    return updates
+
+
+# Merges data returned by pop_updates().
+def merge(updates: tuple[dict, dict]):
+    node_timings, templates = updates
+    for url, phases in node_timings.items():
+        for phase, seconds in phases.items():
+            add(url, phase, seconds)
+    _templates.update(templates)
+
+
+# Returns the profiling data as a dictionary.
+def report() -> dict:
+    nodes = {}
+    templates = {}
+    for url, phases in _nodes.items():
+        total = sum(phases.values())
+        nodes[url] = {
+            'template': _templates.get(url),
+            'phases': dict(sorted(phases.items())),
+            'total': total,
+        }
+        if url in _templates:
+            entry = templates.setdefault(_templates[url], {'count': 0, 'total': 0.0})
+            entry['count'] += 1
+            entry['total'] += phases.get('template', 0.0)
+    return {
+        'version': __version__,
+        'runtime': site.runtime(),
+        'pages_rendered': site.pages_rendered(),
+        'pages_written': site.pages_written(),
+        'nodes': dict(sorted(nodes.items())),
+        'templates': dict(sorted(templates.items())),
+    }
+
+
+# Prints the slowest nodes and templates.
+def print_report(top: int):
+    data = report()
+
+    utils.termline()
+    utils.safeprint("Slowest nodes:")
+    utils.termline()
+    ranked = sorted(data['nodes'].items(), key=lambda item: item[1]['total'], reverse=True)
+    for url, entry in ranked[:top]:
+        phases = sorted(entry['phases'].items(), key=lambda item: item[1], reverse=True)
+        details = ', '.join(f"{phase} {seconds:.4f}" for phase, seconds in phases)
+        utils.safeprint(f"{entry['total']:8.4f} sec   ·   {url}   \u001B[90m{details}\u001B[0m")
+
+    utils.termline()
+    utils.safeprint("Slowest templates:")
+    utils.termline()
+    ranked = sorted(data['templates'].items(), key=lambda item: item[1]['total'], reverse=True)
+    for name, entry in ranked[:top]:
+        mean = entry['total'] / entry['count']
+        line = f"{entry['total']:8.4f} sec   ·   {name}   "
+        line += f"\u001B[90m{entry['count']} pages, {mean:.4f} sec/page\u001B[0m"
+        utils.safeprint(line)
+    utils.termline()
+
+
+# Writes the profiling data to a JSON file.
+def write_json(path: str):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report(), file, indent=2)
+        file.write('\n')
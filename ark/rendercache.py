@@ -0,0 +1,228 @@
+# ------------------------------------------------------------------------------
+# This module implements Ark's persistent render cache.
+#
+# Rendering node text into HTML is usually the most expensive part of a build.
+# We cache the output of the rendering engines on disk, keyed by a hash of the
+# input text, the file extension, and the renderer settings, so unchanged
+# nodes can load their HTML from the cache on the next build run.
+#
+# Each entry is stored as a separate file. Entries are touched when they're
+# read and the least recently used entries are evicted at the end of the build
+# if the cache grows larger than the `render_cache_size` setting (in MB). The
+# cache can only have grown if entries were added so builds which only read
+# from the cache skip the check.
+# ------------------------------------------------------------------------------
+
+import os
+import shutil
+import hashlib
+import threading
+
+from . import __version__
+from . import site
+from . import events
+from . import renderers
+
+
+# Set to false to bypass the cache.
+enabled = True
+
+
+# Default maximum size of the cache in MB.
+default_size = 256
+
+
+# Caches the digest of the renderer settings for the current run.
+_settings = None
+
+
+# Number of entries added in this run.
+_added = 0
+
+
+# Serializes updates to the count of added entries from writer threads.
+_lock = threading.Lock()
+
+
+# Renders a string into HTML using the cache if possible. The `source`
+# parameter is only used for reporting errors.
+def render(text: str, ext: str, source: str = '') -> str:
+    if not enabled or not renderers.is_registered_ext(ext):
+        return renderers.render(text, ext, source)
+
+    key = _key(text, ext)
+    if (html := get(key)) is None:
+        html = renderers.render(text, ext, source)
+        put(key, html)
+    return html
+
+
+# Returns the cached value for `key` or None if there isn't one.
+def get(key: str) -> str|None:
+    path = _path(key)
+    try:
+        with open(path, encoding='utf-8', newline='') as file:
+            value = file.read()
+        os.utime(path)
+        return value
+    except OSError:
+        return None
+
+
+# Adds a value to the cache. The file is written under a temporary name and
+# then moved into place so concurrent builds never see a partial entry.
+def put(key: str, value: str):
+    path = _path(key)
+    temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp, 'w', encoding='utf-8', newline='') as file:
+            file.write(value)
+        os.replace(temp, path)
+    except OSError:
+        return
+    global _added
+    with _lock:
+        _added += 1
+
+
+# Returns the number of entries added since the last call to this function and
+# resets the count. Parallel builds use this to collect the counts from worker
+# processes.
+def pop_updates() -> int:
+    global _added
+    with _lock:
+        updates, _added = _added, 0
+    return updates
+
+
+# Adds a count returned by pop_updates().
+def merge(updates: int):
+    global _added
+    with _lock:
+        _added += updates
+
+
+# Returns the cache key for a string of text with the specified extension.
+def _key(text: str, ext: str) -> str:
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(_settings_digest().encode())
+    hasher.update(ext.encode() + b'\0')
+    hasher.update(text.encode())
+    return hasher.hexdigest()
+
+
+# Returns a digest of everything other than the input text which affects the
+# output of the rendering engines: their settings, the callbacks registered
+# for each extension, and the versions of the rendering libraries.
+def _settings_digest() -> str:
+    global _settings
+    if _settings is None:
+        # Imported here as it's slow to import and only needed for builds.
+        import importlib.metadata
+        parts = [__version__]
+        for key in ('markdown_settings', 'syntext_settings'):
+            parts.append(_stable_repr(site.config.get(key)))
+        for ext, func in sorted(renderers._callbacks.items()):
+            parts.append(f"{ext}:{func.__module__}.{func.__qualname__}")
+            if code := getattr(func, '__code__', None):
+                parts.append(f"{code.co_filename}:{_signature(code.co_filename)}")
+        for name in ('markdown', 'syntext', 'pygments'):
+            try:
+                parts.append(f"{name}:{importlib.metadata.version(name)}")
+            except importlib.metadata.PackageNotFoundError:
+                pass
+        _settings = hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+    return _settings
+
+
+# Returns a representation of a settings value which is stable between runs.
+# The default repr() of an object includes its memory address so objects, e.g.
+# Markdown extension instances, are represented by their type and attributes.
+def _stable_repr(value, seen: set|None = None) -> str:
+    seen = set() if seen is None else seen
+    if isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return repr(value)
+    if id(value) in seen:
+        return '...'
+    seen = seen | {id(value)}
+    if isinstance(value, dict):
+        items = sorted((_stable_repr(k, seen), _stable_repr(v, seen)) for k, v in value.items())
+        return '{' + ', '.join(f"{k}: {v}" for k, v in items) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_stable_repr(item, seen) for item in value) + ']'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(_stable_repr(item, seen) for item in value)) + '}'
+    cls = type(value)
+    name = getattr(value, '__qualname__', None) or cls.__qualname__
+    module = getattr(value, '__module__', None) or cls.__module__
+    if callable(value) and hasattr(value, '__qualname__'):
+        return f"{module}.{name}"
+    if attrs := getattr(value, '__dict__', None):
+        return f"{module}.{name}({_stable_repr(attrs, seen)})"
+    return f"{module}.{name}"
+
+
+# Returns the (mtime, size) signature of a file or None if it doesn't exist.
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+# Delete the cache directory.
+def clear():
+    shutil.rmtree(_cachedir(), ignore_errors=True)
+
+
+# Returns the path to the file for a cache entry.
+def _path(key: str) -> str:
+    return os.path.join(_cachedir(), key[:2], key)
+
+
+# Returns the path to the cache directory for the current site.
+def _cachedir() -> str:
+    return site.cachefile('.render')
+
+
+# Yields a DirEntry for each file in the cache.
+def _entries(dirpath: str):
+    for subdir in os.scandir(dirpath):
+        if subdir.is_dir():
+            yield from (entry for entry in os.scandir(subdir.path) if entry.is_file())
+
+
+# Evict the least recently used entries if the cache has grown too large. We
+# only need to check if entries have been added in this run.
+@events.register(events.Event.EXIT_BUILD)
+def _evict():
+    if not enabled or not _added:
+        return
+
+    dirpath = _cachedir()
+    if not os.path.isdir(dirpath):
+        return
+
+    entries = []
+    for entry in _entries(dirpath):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    limit = int(site.config.get('render_cache_size', default_size) * 1024 * 1024)
+    total = sum(size for _, size, _ in entries)
+    if total <= limit:
+        return
+
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+        if total <= limit:
+            break
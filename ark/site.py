@@ -2,20 +2,42 @@
 # This module loads, processes, and caches the site's configuration data.
 # ------------------------------------------------------------------------------
 
+from __future__ import annotations
+
 import os
 import sys
 import time
-import pathlib
+import hashlib
+import collections.abc
 
-from . import renderers
+from . import rendercache
 from . import utils
+from . import deps
 
 from os.path import isdir, isfile, join, abspath
 
 
+# The site configuration dictionary reports each key it's asked for to the
+# dependency tracker so incremental builds can tell which configuration values
+# each page depends on.
+class Config(dict):
+
+    def __getitem__(self, key):
+        deps.add_config(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        deps.add_config(key)
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        deps.add_config(key)
+        return super().get(key, default)
+
+
 # This dictionary contains the content of the site's `config.py` file. It can
 # be accessed in template files via the `site` variable.
-config = {}
+config = Config()
 
 
 # Storage for temporary data generated during the build process.
@@ -34,6 +56,9 @@ def init():
     # Initialize a count of the number of pages written to disk.
     cache["pages_written"] = 0
 
+    # Initialize a count of the number of pages skipped by incremental builds.
+    cache["pages_skipped"] = 0
+
     # Default site configuration settings.
     config["theme"] = "graphite"
     config["root_url"] = ""
@@ -42,11 +67,14 @@ def init():
     # The Unix timestamp is useful as a cache-busting parameter.
     config["timestamp"] = int(time.time())
 
-    # Load the site configuration file.
+    # Load the site configuration file. (The exec() function requires a plain
+    # dictionary for its global namespace.)
     _, site_config_file = _find_site_directory()
     if site_config_file:
+        namespace = dict(config)
         with open(site_config_file, encoding="utf-8") as file:
-            exec(file.read(), config)
+            exec(file.read(), namespace)
+        config.update(namespace)
 
     # Delete the __builtins__ attribute as it pollutes variable dumps.
     if "__builtins__" in config:
@@ -183,6 +211,18 @@ def theme(*append: str) -> str:
     return ""
 
 
+# Returns the path to a file in the user's cache directory for storing build
+# data for the current site between runs. Files are named using a hash of the
+# site's home directory path plus the specified suffix.
+def cachefile(suffix: str) -> str:
+    if os.name == "nt":
+        root = os.getenv("LOCALAPPDATA", os.path.expanduser("~"))
+        root = join(root, "Ark")
+    else:
+        root = os.path.expanduser("~/.cache/ark")
+    return join(root, hashlib.sha1(home().encode()).hexdigest() + suffix)
+
+
 # Returns the application runtime in seconds.
 def runtime() -> float:
     return time.time() - cache["start_time"]
@@ -200,19 +240,138 @@ def pages_written(n: int = 0) -> int:
     return cache["pages_written"]
 
 
-# Returns a cached dictionary of rendered files from the `inc` directory.
-# The dictionary's keys are the original filenames converted to lowercase
-# with spaces and hyphens replaced by underscores.
-def includes() -> dict[str, str]:
+# Increments the count of pages skipped by incremental builds by n and returns
+# the new value.
+def pages_skipped(n: int = 0) -> int:
+    cache["pages_skipped"] += n
+    return cache["pages_skipped"]
+
+
+# A lazy mapping of rendered files from the `inc` directory. Each file is
+# rendered the first time its key is looked up, using the render cache, so
+# includes which no template uses are never rendered. The inputs each file
+# reads are added to the dependency record of every page which uses it.
+class Includes(collections.abc.MutableMapping):
+
+    def __init__(self, paths: dict[str, str]):
+        self._paths = paths
+        self._html = {}
+        self._deps = {}
+        self._resolved = {}
+
+    def __getitem__(self, key):
+        if key not in self._html:
+            if key not in self._paths:
+                deps.add_file(inc())
+                raise KeyError(key)
+            path = self._paths[key]
+            deps.push()
+            deps.add_file(path)
+            text, _ = utils.loadfile(path)
+            ext = os.path.splitext(path)[1].strip(".")
+            self._html[key] = rendercache.render(text, ext, path)
+            self._deps[key] = deps.pop()
+        deps.add_record(self._deps[key])
+        return self._html[key]
+
+    # Extensions can assign pre-rendered HTML to a key, adding a new include
+    # or replacing a file's rendered content.
+    def __setitem__(self, key, html):
+        self._html[key] = html
+        self._deps[key] = None
+        self._invalidate(key)
+
+    def __delitem__(self, key):
+        if key not in self._html and key not in self._paths:
+            raise KeyError(key)
+        self._html.pop(key, None)
+        self._deps.pop(key, None)
+        self._paths.pop(key, None)
+        self._invalidate(key)
+
+    # Looking up a missing key doesn't record a dependency on a file, so we
+    # record a dependency on the `inc` directory instead. Its mtime changes if
+    # a file is added or removed.
+    def __contains__(self, key):
+        if key not in self._html and key not in self._paths:
+            deps.add_file(inc())
+            return False
+        return True
+
+    def __iter__(self):
+        deps.add_file(inc())
+        return iter(self._keys())
+
+    def __len__(self):
+        deps.add_file(inc())
+        return len(self._keys())
+
+    # Returns the keys of the include files followed by any assigned keys.
+    def _keys(self) -> list[str]:
+        return list(self._paths) + [key for key in self._html if key not in self._paths]
+
+    # Discards any resolved copies of the value for `key`.
+    def _invalidate(self, key):
+        for view in self._resolved.values():
+            view._html.pop(key, None)
+
+    # Returns a view of the mapping with @root/ urls resolved for a page at the
+    # specified depth below the output directory.
+    def resolved(self, depth: int) -> ResolvedIncludes:
+        if depth not in self._resolved:
+            self._resolved[depth] = ResolvedIncludes(self, depth)
+        return self._resolved[depth]
+
+
+# A view of an Includes mapping with @root/ urls resolved for a specific page
+# depth. Resolved values are cached. Assigning to or deleting a key updates the
+# underlying Includes mapping and so every view.
+class ResolvedIncludes(collections.abc.MutableMapping):
+
+    def __init__(self, includes: Includes, depth: int):
+        self._includes = includes
+        self._depth = depth
+        self._html = {}
+
+    def __getitem__(self, key):
+        html = self._includes[key]
+        if key not in self._html:
+            self._html[key] = utils.resolve_urls(html, self._depth)
+        return self._html[key]
+
+    def __setitem__(self, key, html):
+        self._includes[key] = html
+
+    def __delitem__(self, key):
+        del self._includes[key]
+
+    def __contains__(self, key):
+        return key in self._includes
+
+    def __iter__(self):
+        return iter(self._includes)
+
+    def __len__(self):
+        return len(self._includes)
+
+
+# Returns a cached mapping of rendered files from the `inc` directory.
+# The mapping's keys are the original filenames converted to lowercase
+# with spaces and hyphens replaced by underscores. If `depth` is specified,
+# @root/ urls are resolved for a page at that depth below the output directory.
+def includes(depth: int|None = None) -> Includes|ResolvedIncludes:
     if not "includes" in cache:
-        cache["includes"] = {}
+        paths = {}
         if isdir(inc()):
-            for path in pathlib.Path(inc()).iterdir():
-                text, _ = utils.loadfile(path)
-                ext = path.suffix.strip(".")
-                key = path.stem.lower().replace(" ", "_").replace("-", "_")
-                cache["includes"][key] = renderers.render(text, ext, str(path))
-    return cache["includes"]
+            for entry in os.scandir(inc()):
+                if entry.is_file():
+                    stem = os.path.splitext(entry.name)[0]
+                    key = stem.lower().replace(" ", "_").replace("-", "_")
+                    paths[key] = entry.path
+        cache["includes"] = Includes(paths)
+    if depth is None:
+        return cache["includes"]
+    return cache["includes"].resolved(depth)
 
 
 # Deprecated aliases.
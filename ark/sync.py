@@ -0,0 +1,243 @@
+# ------------------------------------------------------------------------------
+# This module copies resource files to the output directory.
+#
+# Each build copies the theme's resource files and then the site's resource
+# files to the output directory. As these trees can be large we try to do as
+# little work as possible for files which haven't changed:
+#
+#   * We walk each tree using `os.scandir()` and make a single stat call per
+#     source file.
+#   * We record the source file and signature (mtime and size) for each output
+#     file along with the output file's own signature after copying. If none
+#     of these has changed since the last build we skip the file, so an output
+#     file which has been edited, replaced, or deleted is restored.
+#
+# Files are stat'ed and copied on a small pool of threads. Files can be copied,
+# hard-linked, or reflinked (on filesystems which support copy-on-write
+# clones). Links fall back to copies, e.g. if the output directory is on a
+# different filesystem.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import shutil
+import pickle
+import concurrent.futures
+
+from . import site
+
+
+# Number of threads used to stat and copy files.
+num_threads = 8
+
+
+# Number of files handed to a thread at a time.
+chunk_size = 256
+
+
+# Supported values of the 'resource_sync_mode' config setting.
+modes = ('copy', 'hardlink', 'reflink')
+
+
+# Names which are never copied.
+_ignored = ('__pycache__', '.DS_Store')
+
+
+# Linux ioctl request for cloning a file: FICLONE.
+_FICLONE = 0x40049409
+
+
+# Link modes which have failed during this run. We copy instead of retrying.
+_unsupported = set()
+
+
+# Copies the files in each directory in `srcdirs` to `dstdir`. Where several
+# source directories contain a file with the same relative path the last one
+# wins. Returns the list of output files relative to `dstdir`.
+def sync(srcdirs: list[str], dstdir: str, mode: str = 'copy') -> list[str]:
+    if mode not in modes:
+        sys.exit(f"Error: invalid resource_sync_mode '{mode}'.")
+
+    # Map each relative directory path to a dictionary of its file entries.
+    dirs = {}
+    for srcdir in srcdirs:
+        for reldir, entries in _scan(srcdir):
+            dirs.setdefault(reldir, {}).update(entries)
+
+    records = _load()
+    if records.get('mode') != mode or records.get('dstdir') != os.path.abspath(dstdir):
+        records = {}
+    old = records.get('files', {})
+
+    def task(chunk):
+        results = []
+        for reldir, entries in chunk:
+            dirpath = os.path.join(dstdir, reldir)
+            prefix = reldir + os.sep if reldir else ''
+            for name, entry in entries.items():
+                relpath = prefix + name
+                record = old.get(relpath)
+                dst = os.path.join(dirpath, name)
+                results.append((relpath, _sync_file(entry, dst, record, mode)))
+        return results
+
+    # Directories are handed to the pool in chunks as most files only need a
+    # stat.
+    items = sorted((reldir, entries) for reldir, entries in dirs.items() if entries)
+    for reldir, _ in items:
+        os.makedirs(os.path.join(dstdir, reldir), exist_ok=True)
+    chunks, chunk, count = [], [], 0
+    for reldir, entries in items:
+        chunk.append((reldir, entries))
+        count += len(entries)
+        if count >= chunk_size:
+            chunks.append(chunk)
+            chunk, count = [], 0
+    if chunk:
+        chunks.append(chunk)
+
+    new = {}
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+        for results in executor.map(task, chunks):
+            new.update(results)
+
+    _save({'mode': mode, 'dstdir': os.path.abspath(dstdir), 'files': new})
+    return list(new)
+
+
+# Delete any existing record file.
+def clear():
+    if os.path.isfile(_cachefile()):
+        os.remove(_cachefile())
+
+
+# Walks the directory tree `srcdir` and yields a tuple of (relative directory
+# path, {name: DirEntry}) for each directory.
+def _scan(srcdir: str):
+    stack = ['']
+    while stack:
+        reldir = stack.pop()
+        try:
+            iterator = os.scandir(os.path.join(srcdir, reldir))
+        except OSError:
+            continue
+        entries = {}
+        with iterator:
+            for entry in iterator:
+                if entry.name in _ignored:
+                    continue
+                if entry.is_dir():
+                    stack.append(os.path.join(reldir, entry.name))
+                elif entry.is_file():
+                    entries[entry.name] = entry
+        yield reldir, entries
+
+
+# Brings a single output file up to date. `record` is the ((source path,
+# mtime, size), (output size, output mtime)) tuple recorded for the output
+# file by the last build. Returns the record for this build.
+def _sync_file(entry, dst: str, record: tuple|None, mode: str) -> tuple:
+    stat = entry.stat()
+    src_sig = (entry.path, stat.st_mtime_ns, stat.st_size)
+    dst_sig = _signature(dst)
+    if dst_sig is not None:
+        if record == (src_sig, dst_sig):
+            return record
+        if record is None and _matches(stat, dst, mode):
+            return (src_sig, dst_sig)
+    _copy(entry.path, dst, mode)
+    return (src_sig, _signature(dst))
+
+
+# Returns the (size, mtime) signature of an output file or None if the file
+# doesn't exist.
+def _signature(dst: str) -> tuple|None:
+    try:
+        dst_stat = os.stat(dst)
+    except OSError:
+        return None
+    return (dst_stat.st_size, dst_stat.st_mtime_ns)
+
+
+# Returns true if `dst` has the same mtime and size as the source file. This
+# lets us adopt output files copied before a record existed. In copy mode an
+# output file hard-linked to its source by an earlier build is replaced.
+def _matches(stat, dst: str, mode: str) -> bool:
+    try:
+        dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    if mode != 'hardlink' and os.path.samestat(stat, dst_stat):
+        return False
+    return (dst_stat.st_mtime_ns, dst_stat.st_size) == (stat.st_mtime_ns, stat.st_size)
+
+
+# Copies, links, or clones `src` to a temporary file which is then moved into
+# place, so an existing output file is replaced atomically.
+def _copy(src: str, dst: str, mode: str):
+    dirpath, name = os.path.split(dst)
+    temp = os.path.join(dirpath, f".{name}.{os.getpid()}.tmp")
+    try:
+        linkers = {'hardlink': _link, 'reflink': _reflink}
+        if mode in linkers and mode not in _unsupported:
+            if not linkers[mode](src, temp):
+                _unsupported.add(mode)
+                shutil.copy2(src, temp)
+        else:
+            shutil.copy2(src, temp)
+        os.replace(temp, dst)
+    except BaseException:
+        if os.path.lexists(temp):
+            os.remove(temp)
+        raise
+
+
+# Attempts to hard-link `src` as `dst`. Returns false on failure.
+def _link(src: str, dst: str) -> bool:
+    try:
+        os.link(src, dst)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+# Attempts to clone `src` as `dst` using a copy-on-write reflink. Returns false
+# if the platform or filesystem doesn't support it.
+def _reflink(src: str, dst: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, 'rb') as infile, open(dst, 'wb') as outfile:
+            fcntl.ioctl(outfile.fileno(), _FICLONE, infile.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+# Returns the name of the record file for the current site.
+def _cachefile() -> str:
+    return site.cachefile('.sync.pickle')
+
+
+# Returns the records saved by the last build.
+def _load() -> dict:
+    try:
+        with open(_cachefile(), 'rb') as file:
+            return pickle.load(file)
+    except Exception:
+        return {}
+
+
+# Saves the records for the next build.
+def _save(records: dict):
+    path = _cachefile()
+    temp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(temp, 'wb') as file:
+        pickle.dump(records, file)
+    os.replace(temp, path)
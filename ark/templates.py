@@ -8,6 +8,7 @@ import pathlib
 
 from . import site
 from . import utils
+from . import profiler
 
 
 # Stores registered template-engine callbacks indexed by file extension.
@@ -54,6 +55,7 @@ def render(page_data):
             if name == path.stem:
                 ext = path.suffix.strip('.')
                 if ext in _callbacks:
+                    profiler.set_template(page_data['node'].url, path.name)
                     try:
                         return _callbacks[ext](page_data, path.name)
                     except Exception as err:
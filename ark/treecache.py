@@ -0,0 +1,148 @@
+# ------------------------------------------------------------------------------
+# This module implements Ark's persistent cache of parsed node metadata.
+#
+# Assembling the node tree means reading the metadata header of every source
+# file and running it through the `file_text` filters. We cache the metadata
+# for each file between runs, keyed by the file's path, modification time, and
+# size, so only files which have changed need to be parsed again.
+#
+# The whole cache is discarded if the callbacks registered on the `file_text`,
+# `load_node_dir`, or `load_node_file` filter hooks change, or if any of the
+# files that define them are modified.
+# ------------------------------------------------------------------------------
+
+import os
+import pickle
+import hashlib
+import threading
+
+from . import __version__
+from . import site
+from . import utils
+from . import filters
+
+
+# Set to false to bypass the cache.
+enabled = True
+
+
+# Cached entries from the last run, indexed by filepath. Each entry is a tuple
+# of (signature, metadata). None until loaded.
+_entries = None
+
+
+# Entries used in the current run.
+_used = {}
+
+
+# True if the current run has parsed any files.
+_updated = False
+
+
+# Serializes loading the cache file. Directories are scanned on multiple threads.
+_lock = threading.Lock()
+
+
+# Returns the metadata from a source file's header, loading it from the cache
+# if the file hasn't changed.
+def loadheader(path) -> dict:
+    if not enabled:
+        return utils.loadheader(path)
+
+    global _updated
+    path = str(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return utils.loadheader(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    entry = _load().get(path)
+    if entry is None or entry[0] != signature:
+        entry = (signature, utils.loadheader(path))
+        _updated = True
+    _used[path] = entry
+    return dict(entry[1])
+
+
+# Writes the cache to disk if anything has changed. If `partial` is true, only
+# part of the tree has been parsed so entries from the last run are kept.
+def save(partial: bool = False):
+    if not enabled:
+        return
+    entries = dict(_load()) if partial else {}
+    entries.update(_used)
+    if not _updated and entries.keys() == _load().keys():
+        return
+
+    data = {'fingerprint': _fingerprint(), 'entries': entries}
+    path = _cachefile()
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp, 'wb') as file:
+            pickle.dump(data, file)
+        os.replace(temp, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        # Metadata added by a `file_text` filter may not be picklable.
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+# Delete any existing cache file.
+def clear():
+    global _entries
+    _entries = {}
+    if os.path.isfile(_cachefile()):
+        os.remove(_cachefile())
+
+
+# Returns the entries from the last run. Loads the cache file on first use.
+def _load() -> dict:
+    global _entries
+    if _entries is None:
+        with _lock:
+            if _entries is None:
+                entries = {}
+                try:
+                    with open(_cachefile(), 'rb') as file:
+                        data = pickle.load(file)
+                    if data['fingerprint'] == _fingerprint():
+                        entries = data['entries']
+                except Exception:
+                    pass
+                _entries = entries
+    return _entries
+
+
+# Returns a digest identifying the callbacks which affect parsing and the
+# files which define them.
+def _fingerprint() -> str:
+    # Imported here as it's slow to import and only needed for builds.
+    import importlib.metadata
+    parts = [__version__]
+    for hook in (filters.Filter.FILE_TEXT, filters.Filter.LOAD_NODE_DIR, filters.Filter.LOAD_NODE_FILE):
+        for order, callbacks in sorted(filters._callbacks.get(hook, {}).items()):
+            for func in callbacks:
+                parts.append(f"{hook.value}:{order}:{func.__module__}.{func.__qualname__}")
+                if code := getattr(func, '__code__', None):
+                    parts.append(f"{code.co_filename}:{_signature(code.co_filename)}")
+    try:
+        parts.append(f"pyyaml:{importlib.metadata.version('pyyaml')}")
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+
+# Returns the (mtime, size) signature of a file or None if it doesn't exist.
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+# Returns the name of the cache file for the current site.
+def _cachefile() -> str:
+    return site.cachefile('.tree.pickle')
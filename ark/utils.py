@@ -7,6 +7,9 @@ import shutil
 import re
 import sys
 import unicodedata
+import functools
+import contextlib
+import mmap
 
 from . import filters
 from . import site
@@ -30,7 +33,7 @@ def copydir(srcdir: str, dstdir: str, noclobber: bool = False):
     if not os.path.exists(srcdir):
         return
     if not os.path.exists(dstdir):
-        os.makedirs(dstdir)
+        os.makedirs(dstdir, exist_ok=True)
     for name in os.listdir(srcdir):
         src = os.path.join(srcdir, name)
         dst = os.path.join(dstdir, name)
@@ -60,22 +63,45 @@ def copyfile(src: str, dst: str, noclobber: bool = False):
 def writefile(path: str, content: str):
     path = os.path.abspath(path)
     if not os.path.isdir(os.path.dirname(path)):
-        os.makedirs(os.path.dirname(path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, 'w', encoding='utf-8') as file:
         file.write(content)
 
 
+# Regexes for slugifying strings.
+regex_slug_chars = re.compile(r'[^a-z0-9-]+')
+regex_slug_dashes = re.compile(r'--+')
+
+
 # Default slug-preparation function; returns a slugified version of the
 # input string. This function is used to sanitize url components, etc.
+# Slugs are memoized. Custom `slugify` filter callbacks are assumed to return
+# the same slug for the same input; memoized slugs are discarded if the
+# callbacks registered on the `slugify` hook change.
 def slugify(input_string: str) -> str:
+    return _slugify(input_string, filters.version('slugify'))
+
+
+# Slugify a list of strings, e.g. the taxonomy terms for a site.
+def slugify_many(input_strings) -> list[str]:
+    version = filters.version('slugify')
+    return [_slugify(input_string, version) for input_string in input_strings]
+
+
+# Memoized implementation of slugify(). The `version` argument is the version
+# of the `slugify` filter hook so slugs are recomputed when it changes.
+@functools.lru_cache(maxsize=65536)
+def _slugify(input_string: str, version: int) -> str:
     if custom_slug := filters.apply('slugify', None, input_string):
         return custom_slug
-    output = unicodedata.normalize('NFKD', input_string)
-    output = output.encode('ascii', errors='ignore').decode('ascii')
+    output = input_string
+    if not output.isascii():
+        output = unicodedata.normalize('NFKD', output)
+        output = output.encode('ascii', errors='ignore').decode('ascii')
     output = output.lower()
     output = output.replace("'", '')
-    output = re.sub(r'[^a-z0-9-]+', '-', output)
-    output = re.sub(r'--+', '-', output)
+    output = regex_slug_chars.sub('-', output)
+    output = regex_slug_dashes.sub('-', output)
     return output.strip('-')
 
 
@@ -108,56 +134,165 @@ regex_url = re.compile(r"""
 """, re.VERBOSE)
 
 
-# Rewrite all @root/ urls in the HTML document to their final form.
-# Deprecated: site.config.get('extension'), replaced by site.config.get('file_extension').
-# Deprecated: site.config.get('root'), replaced by site.config.get('root_url').
+# Rewrite all @root/ urls in the HTML document to their final form. Templates
+# can resolve urls directly using resolve_url(), so this pass is skipped if the
+# page no longer contains any @root/ urls.
 def rewrite_urls(html: str, filepath: str):
-    relpath = os.path.relpath(filepath, site.out())
-    depth = len(relpath.replace('\\', '/').split('/'))
-    prefix = site.config.get('root') or site.config.get('root_url') or '../' * (depth - 1)
-    suffix = site.config.get('extension') or site.config.get('file_extension')
+    if '@root/' not in html:
+        return html
+    return resolve_urls(html, url_depth(filepath))
+
+
+# Rewrite all @root/ urls in a fragment of HTML to their final form for a page
+# `depth` levels below the output directory.
+def resolve_urls(html: str, depth: int) -> str:
+    if '@root/' not in html:
+        return html
+    root, suffix = _url_config()
 
     # Each matched url is replaced with the output of this callback.
     def callback(match):
         quote = match.group(1)
-        url = match.group(2).lstrip('/') if match.group(2) else ''
-        fragment = match.group(3) or ''
-
-        # 1. We have a link to the homepage.
-        if url == '':
-            if suffix == '/':
-                if depth == 1:
-                    url = '' if fragment else '#'
-                else:
-                    url = prefix
-            else:
-                url = prefix + 'index' + suffix
+        return quote + _resolve_url(match.group(0)[1:-1], depth, root, suffix) + quote
+
+    # Replace each match with the return value of the callback.
+    return regex_url.sub(callback, html)
+
+
+# Resolve a single @root/ url to its final form for a page `depth` levels below
+# the output directory. Other urls are returned unchanged.
+def resolve_url(url: str, depth: int) -> str:
+    if not url.startswith('@root/'):
+        return url
+    return _resolve_url(url, depth, *_url_config())
 
-        # 2. We have a link to a generated node page.
-        elif url.endswith('//'):
-            if suffix == '/':
-                url = prefix + url.rstrip('/') + '/'
+
+# Returns the depth of an output file below the output directory. Files in the
+# output directory itself have a depth of 1.
+def url_depth(filepath: str) -> int:
+    relpath = os.path.relpath(filepath, site.out())
+    return len(relpath.replace('\\', '/').split('/'))
+
+
+# Returns the (root, suffix) url settings from the site's config file.
+# Deprecated: site.config.get('extension'), replaced by site.config.get('file_extension').
+def _url_config() -> tuple:
+    root = site.config.get('root') or site.config.get('root_url')
+    suffix = site.config.get('extension') or site.config.get('file_extension')
+    return root, suffix
+
+
+# Resolved urls are cached as pages at the same depth share most of their links,
+# e.g. menus, stylesheets, and scripts.
+@functools.lru_cache(maxsize=8192)
+def _resolve_url(url: str, depth: int, root: str|None, suffix: str|None) -> str:
+    prefix = root or '../' * (depth - 1)
+    url, hashmark, fragment = url[len('@root/'):].partition('#')
+    url = url.lstrip('/')
+    fragment = hashmark + fragment
+
+    # 1. We have a link to the homepage.
+    if url == '':
+        if suffix == '/':
+            if depth == 1:
+                url = '' if fragment else '#'
             else:
-                url = prefix + url.rstrip('/') + suffix
+                url = prefix
+        else:
+            url = prefix + 'index' + suffix
 
-        # 3. We have a link to a static asset or directory.
+    # 2. We have a link to a generated node page.
+    elif url.endswith('//'):
+        if suffix == '/':
+            url = prefix + url.rstrip('/') + '/'
         else:
-            url = prefix + url
+            url = prefix + url.rstrip('/') + suffix
 
-        return f"{quote}{url}{fragment}{quote}"
+    # 3. We have a link to a static asset or directory.
+    else:
+        url = prefix + url
 
-    # Replace each match with the return value of the callback.
-    return regex_url.sub(callback, html)
+    return url + fragment
+
+
+# Source files larger than this size in bytes are memory-mapped rather than read.
+mmap_threshold = 64 * 1024
 
 
 # Load a source file. The `path` parameter can be either a string or a
 # pathlib.Path instance. File metadata (e.g. yaml headers) can be extracted by
 # preprocessor callbacks registered on the 'file_text' filter hook.
 def loadfile(path):
+    return _load(path, header_only=False)
+
+
+# Load a source file's metadata header. Reads the file only as far as the end
+# of its '---' delimited header, if it has one, and runs the header through the
+# 'file_text' filter hook. Returns the metadata dictionary.
+def loadheader(path) -> dict:
+    _, meta = _load(path, header_only=True)
+    return meta
+
+
+# Reads a '---' delimited header from the start of a file. Returns an empty
+# string if the file doesn't begin with a header.
+def _readheader(file) -> str:
+    if (line := file.readline()) != '---\n':
+        return ''
+    lines = [line]
+    while line := file.readline():
+        lines.append(line)
+        if line == '---\n':
+            break
+    return ''.join(lines)
+
+
+# Opens a source file as a bytes-like object. Large files are memory-mapped
+# rather than read. Line endings are normalized to '\n'.
+@contextlib.contextmanager
+def _openbytes(path):
+    with open(str(path), 'rb') as file:
+        if os.fstat(file.fileno()).st_size < mmap_threshold:
+            data = file.read()
+            if b'\r' in data:
+                data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            yield data
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data.find(b'\r') != -1:
+                yield data[:].replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            else:
+                yield data
+
+
+# Returns the offset of the end of a '---' delimited header at the start of a
+# file. Returns 0 if the file doesn't begin with a header. If the header isn't
+# closed it extends to the end of the file.
+def _header_end(data) -> int:
+    if data[:4] != b'---\n':
+        return 0
+    end = data.find(b'\n---\n', 3)
+    return len(data) if end == -1 else end + 5
+
+
+# Reads a source file and filters the result. If `header_only` is true only
+# the file's header is read. Otherwise, if every `file_text` filter is
+# header-only, the header is filtered on its own and the body is decoded
+# directly from the file's bytes without an intermediate copy of the text.
+def _load(path, header_only: bool):
     try:
-        with open(str(path), encoding='utf-8') as file:
-            text, meta = file.read(), {}
-        text = filters.apply('file_text', text, meta)
+        meta = {}
+        if header_only:
+            with open(str(path), encoding='utf-8') as file:
+                text = filters.apply('file_text', _readheader(file), meta)
+        else:
+            with _openbytes(path) as data, memoryview(data) as view:
+                if filters.is_header_only('file_text'):
+                    end = _header_end(data)
+                    header = filters.apply('file_text', str(view[:end], 'utf-8'), meta)
+                    text = header + str(view[end:], 'utf-8')
+                else:
+                    text = filters.apply('file_text', str(view, 'utf-8'), meta)
         for key, value in list(meta.items()):
             normalized_key = key.lower().replace(' ', '_').replace('-', '_')
             if normalized_key != key:
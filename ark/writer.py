@@ -0,0 +1,155 @@
+# ------------------------------------------------------------------------------
+# This module implements the build's background writer stage.
+#
+# Rendering pages is CPU-bound while writing them to disk is IO-bound. Instead
+# of blocking on each write, the rendering thread hands finished pages off to a
+# small pool of writer threads via a bounded queue and moves on to the next
+# page. If the queue fills up the rendering thread waits for the writers to
+# catch up, so memory use stays bounded even if the disk is slow.
+#
+# When the pool hasn't been started, e.g. when an extension calls Node.write()
+# outside of a build, tasks run synchronously in the calling thread.
+#
+# Each page is encoded once; the same bytes are hashed and written. Pages are
+# written to a temporary file which is then moved into place, so a server or
+# sync tool reading the output directory never sees a partially-written page.
+# ------------------------------------------------------------------------------
+
+import os
+import queue
+import threading
+
+from . import site
+from . import hashes
+from . import manifest
+from . import profiler
+
+
+# Number of writer threads.
+num_threads = 4
+
+
+# Maximum number of tasks waiting in the queue.
+max_pending = 64
+
+
+# Queue of pending tasks. None if the pool isn't running.
+_queue = None
+
+
+# The running writer threads.
+_threads = []
+
+
+# Exceptions raised by tasks.
+_errors = []
+
+
+# Serializes updates to the page counts.
+_lock = threading.Lock()
+
+
+# Output directories known to exist.
+_dirs = set()
+
+
+# Starts the writer threads.
+def start():
+    global _queue
+    if _queue is None:
+        _queue = queue.Queue(max_pending)
+        for _ in range(num_threads):
+            thread = threading.Thread(target=_work, args=(_queue,), daemon=True)
+            thread.start()
+            _threads.append(thread)
+
+
+# Adds a task to the queue. Blocks if the queue is full. If a previous task
+# has failed, its exception is raised here so the build stops early.
+def submit(func, *args):
+    if _errors:
+        _raise_error()
+    if _queue is None:
+        func(*args)
+    else:
+        _queue.put((func, args))
+
+
+# Queues a page to be written to disk. The node's `url` is only used for
+# profiling.
+def write(filepath: str, content: str, url: str = ''):
+    submit(_write_page, filepath, content, url)
+
+
+# Waits for all queued tasks to complete.
+def flush():
+    if _queue is not None:
+        _queue.join()
+    if _errors:
+        _raise_error()
+
+
+# Waits for all queued tasks to complete and stops the writer threads.
+def finish():
+    global _queue
+    if _queue is not None:
+        _queue.join()
+        for _ in _threads:
+            _queue.put(None)
+        for thread in _threads:
+            thread.join()
+        _threads.clear()
+        _queue = None
+    if _errors:
+        _raise_error()
+
+
+# Writes a page to disk. Avoids overwriting identical files.
+def _write_page(filepath: str, content: str, url: str):
+    with profiler.timer(url, 'write'):
+        manifest.add(filepath)
+        data = hashes.encode(content)
+        digest = hashes.digest(data)
+        if not hashes.match(filepath, digest):
+            _write_bytes(filepath, data)
+            hashes.update(filepath, digest)
+            with _lock:
+                site.pages_written(1)
+
+
+# Writes bytes to a file atomically. Creates parent directories if required.
+def _write_bytes(filepath: str, data: bytes):
+    filepath = os.path.abspath(filepath)
+    dirpath, filename = os.path.split(filepath)
+    if dirpath not in _dirs:
+        os.makedirs(dirpath, exist_ok=True)
+        _dirs.add(dirpath)
+    temp = os.path.join(dirpath, f".{filename}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp, 'wb') as file:
+            file.write(data)
+        os.replace(temp, filepath)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+# Thread loop. Runs tasks from the queue until it receives None.
+def _work(task_queue):
+    while (task := task_queue.get()) is not None:
+        func, args = task
+        try:
+            func(*args)
+        except BaseException as err:
+            _errors.append(err)
+        finally:
+            task_queue.task_done()
+    task_queue.task_done()
+
+
+# Re-raises the first exception raised by a task in the calling thread.
+def _raise_error():
+    err = _errors[0]
+    _errors.clear()
+    raise err
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# ------------------------------------------------------------------------------
+# Generates a synthetic Ark site for benchmarking.
+#
+# Nodes are spread over a directory tree of the specified depth. Each node file
+# has a YAML header and a Markdown body of roughly the specified size. Bodies
+# contain a configurable mix of Markdown features, including @root/ links to
+# other nodes in the site. Output is deterministic for a given set of options.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import math
+import random
+import shutil
+import argslib
+
+
+helptext = """
+Usage: generate.py [options] <directory>
+
+  Generate a synthetic Ark site in the specified directory. Any existing
+  directory will be replaced.
+
+Arguments:
+  <directory>               Directory to create.
+
+Options:
+  -d, --depth <int>         Depth of the source directory tree. Default: 3.
+  -f, --features <list>     Comma-separated list of Markdown features to use.
+                            Default: headings,lists,code,links,emphasis.
+  -m, --meta <int>          Number of extra YAML header keys per node.
+                            Default: 5.
+  -n, --nodes <int>         Number of nodes to generate. Default: 1000.
+  -s, --size <int>          Approximate body size in bytes. Default: 2000.
+      --seed <int>          Random seed. Default: 1.
+  -t, --theme <name>        Theme: graphite or debug. Default: graphite.
+
+Flags:
+  -a, --automenu            Use the automenu instead of an include file menu.
+  -h, --help                Print this help text and exit.
+"""
+
+
+all_features = ('headings', 'lists', 'code', 'links', 'emphasis', 'quotes')
+
+
+words = """
+lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor
+incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud
+exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute
+irure in reprehenderit voluptate velit esse cillum fugiat nulla pariatur
+""".split()
+
+
+# Returns the list of source file paths (relative, without extension) for n
+# nodes spread over a directory tree of the specified depth. File and
+# directory names are valid slugs so the paths double as @root/ urls.
+def node_paths(num_nodes: int, depth: int) -> list[str]:
+    if depth <= 1:
+        return [f"node-{i}" for i in range(num_nodes)]
+    branching = max(2, math.ceil(num_nodes ** (1 / depth)))
+    paths = []
+    for i in range(num_nodes):
+        parts, n = [], i // branching
+        for _ in range(depth - 1):
+            parts.append(f"dir-{n % branching}")
+            n //= branching
+        paths.append('/'.join(reversed(parts)) + f"/node-{i}")
+    return paths
+
+
+def sentence(rng, num_words: int) -> str:
+    return ' '.join(rng.choice(words) for _ in range(num_words)).capitalize() + '.'
+
+
+def header(rng, index: int, num_meta: int) -> str:
+    lines = [
+        '---',
+        f'title: Node {index}',
+        f'date: 20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        f'tags: [{", ".join(rng.sample(words, 3))}]',
+    ]
+    for i in range(num_meta):
+        lines.append(f'meta_{i}: {sentence(rng, 6)}')
+    lines.append('---')
+    return '\n'.join(lines) + '\n\n'
+
+
+def body(rng, size: int, features: list[str], paths: list[str]) -> str:
+    blocks = []
+    length = 0
+    while length < size:
+        feature = rng.choice(features) if features else None
+        if feature == 'headings':
+            block = f"## {sentence(rng, 4)}"
+        elif feature == 'lists':
+            block = '\n'.join(f"* {sentence(rng, 8)}" for _ in range(4))
+        elif feature == 'code':
+            block = '\n'.join(f"    x_{i} = compute({i}, {rng.randint(0, 99)})" for i in range(6))
+        elif feature == 'links':
+            block = f"{sentence(rng, 10)} See [this page](@root/{rng.choice(paths)}//)."
+        elif feature == 'emphasis':
+            block = f"*{sentence(rng, 6)}* {sentence(rng, 12)} **{sentence(rng, 4)}**"
+        elif feature == 'quotes':
+            block = f"> {sentence(rng, 20)}"
+        else:
+            block = ' '.join(sentence(rng, 12) for _ in range(4))
+        blocks.append(block)
+        length += len(block) + 2
+    return '\n\n'.join(blocks) + '\n'
+
+
+def generate(dirpath, num_nodes, depth, size, num_meta, features, theme, automenu, seed):
+    rng = random.Random(seed)
+    paths = node_paths(num_nodes, depth)
+
+    if os.path.exists(dirpath):
+        shutil.rmtree(dirpath)
+    os.makedirs(os.path.join(dirpath, 'src'))
+    os.makedirs(os.path.join(dirpath, 'inc'))
+
+    with open(os.path.join(dirpath, 'site.py'), 'w', encoding='utf-8') as file:
+        file.write(f'title = "Benchmark Site"\ntheme = "{theme}"\n')
+
+    if not automenu:
+        with open(os.path.join(dirpath, 'inc', 'menu.md'), 'w', encoding='utf-8') as file:
+            file.write('* [Home](@root/)\n')
+            for path in paths[:20]:
+                file.write(f'* [{path}](@root/{path}//)\n')
+
+    with open(os.path.join(dirpath, 'src', 'index.md'), 'w', encoding='utf-8') as file:
+        file.write(header(rng, 0, num_meta) + body(rng, size, features, paths))
+
+    for index, path in enumerate(paths, start=1):
+        filepath = os.path.join(dirpath, 'src', *path.split('/')) + '.md'
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w', encoding='utf-8') as file:
+            file.write(header(rng, index, num_meta) + body(rng, size, features, paths))
+
+    return [os.path.join('src', *path.split('/')) + '.md' for path in paths]
+
+
+def main():
+    argparser = argslib.ArgParser(helptext)
+    argparser.flag("automenu a")
+    argparser.option("depth d", type=int, default=3)
+    argparser.option("features f", default="headings,lists,code,links,emphasis")
+    argparser.option("meta m", type=int, default=5)
+    argparser.option("nodes n", type=int, default=1000)
+    argparser.option("size s", type=int, default=2000)
+    argparser.option("seed", type=int, default=1)
+    argparser.option("theme t", default="graphite")
+    argparser.parse()
+
+    if not argparser.args:
+        sys.exit("Error: missing directory argument.")
+
+    features = [f.strip() for f in argparser.value('features').split(',') if f.strip()]
+    for feature in features:
+        if feature not in all_features:
+            sys.exit(f"Error: unknown feature '{feature}'.")
+
+    if argparser.value('theme') not in ('graphite', 'debug'):
+        sys.exit("Error: the theme must be 'graphite' or 'debug'.")
+
+    generate(
+        argparser.args[0],
+        argparser.value('nodes'),
+        argparser.value('depth'),
+        argparser.value('size'),
+        argparser.value('meta'),
+        features,
+        argparser.value('theme'),
+        argparser.found('automenu'),
+        argparser.value('seed'),
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# ------------------------------------------------------------------------------
+# End-to-end build benchmarks.
+#
+# For each requested site size we generate a synthetic site and time a series
+# of scenarios, each run in a fresh Ark process: startup, `ark tree`, a cold
+# build with empty caches, a warm no-change build, and a build after changing
+# a single source file. We report wall time, pages per second, and the peak
+# RSS of the Ark process. Results can be saved as JSON and compared against a
+# previous run, e.g. to check a branch against a release.
+# ------------------------------------------------------------------------------
+
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import shutil
+import tempfile
+import platform
+import subprocess
+import argslib
+
+import generate
+
+
+helptext = """
+Usage: run.py [options]
+
+  Generate synthetic sites and time Ark builds. By default the benchmarks run
+  the copy of Ark in this repository.
+
+Options:
+      --ark <cmd>           Command used to run Ark, e.g. "ark".
+      --args <str>          Extra arguments for builds, e.g. "--jobs 4".
+      --compare <path>      Compare the results with a previous JSON report.
+  -d, --depth <int>         Depth of the source directory tree. Default: 3.
+  -f, --features <list>     Comma-separated list of Markdown features.
+      --json <path>         Write the results to a JSON file.
+  -m, --meta <int>          Number of extra YAML header keys per node.
+  -n, --sizes <list>        Comma-separated list of site sizes in nodes.
+                            Default: 1000,10000,100000.
+  -s, --size <int>          Approximate body size in bytes. Default: 2000.
+  -t, --theme <name>        Theme: graphite or debug. Default: graphite.
+  -w, --workdir <path>      Directory for the generated sites. Defaults to a
+                            temporary directory.
+
+Flags:
+  -a, --automenu            Use the automenu instead of an include file menu.
+  -h, --help                Print this help text and exit.
+  -k, --keep                Keep the generated sites.
+"""
+
+
+scenarios = ('startup', 'tree', 'cold', 'warm', 'change')
+
+
+# Runs a command and returns a tuple of (wall time in seconds, peak RSS in MB,
+# output). We wait on the specific child process so its resource usage isn't
+# mixed up with that of any other child.
+def measure(cmd: list[str], cwd: str, env: dict) -> tuple[float, float, str]:
+    with tempfile.TemporaryFile() as output:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=output, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        output.seek(0)
+        text = output.read().decode('utf-8', errors='replace')
+    if proc.returncode != 0:
+        sys.exit(f"Error: command failed: {shlex.join(cmd)}\n{text}")
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return wall, usage.ru_maxrss / divisor, text
+
+
+# Returns the number of pages rendered according to a build's stats line.
+def pages_rendered(output: str) -> int:
+    if match := re.search(r"Rendered:\s+(\d+)", output):
+        return int(match.group(1))
+    return 0
+
+
+def run_size(num_nodes, options, workdir, ark_cmd, build_args):
+    sitedir = os.path.join(workdir, f"site-{num_nodes}")
+    print(f"Generating a site with {num_nodes} nodes...", file=sys.stderr)
+    files = generate.generate(
+        sitedir,
+        num_nodes,
+        options['depth'],
+        options['size'],
+        options['meta'],
+        options['features'],
+        options['theme'],
+        options['automenu'],
+        1,
+    )
+
+    # Use a private home directory so Ark's caches start out empty.
+    env = dict(os.environ)
+    env['HOME'] = os.path.join(workdir, f"home-{num_nodes}")
+    env['LOCALAPPDATA'] = env['HOME']
+    os.makedirs(env['HOME'], exist_ok=True)
+
+    commands = {
+        'startup': ark_cmd + ['--version'],
+        'tree': ark_cmd + ['tree'],
+        'cold': ark_cmd + ['build'] + build_args,
+        'warm': ark_cmd + ['build'] + build_args,
+        'change': ark_cmd + ['build'] + build_args,
+    }
+
+    results = []
+    for scenario in scenarios:
+        # The tree scenario saves the tree cache, so empty the private home
+        # directory again to make the cold build really cold.
+        if scenario == 'cold':
+            shutil.rmtree(env['HOME'], ignore_errors=True)
+            os.makedirs(env['HOME'], exist_ok=True)
+        if scenario == 'change':
+            with open(os.path.join(sitedir, files[len(files) // 2]), 'a', encoding='utf-8') as file:
+                file.write('\nA changed paragraph.\n')
+        wall, rss, output = measure(commands[scenario], sitedir, env)
+        pages = pages_rendered(output) if scenario in ('cold', 'warm', 'change') else 0
+        results.append({
+            'nodes': num_nodes,
+            'scenario': scenario,
+            'wall': wall,
+            'pages': pages,
+            'pages_per_sec': pages / wall if pages else 0.0,
+            'peak_rss_mb': rss,
+        })
+        print(format_result(results[-1]))
+    return results
+
+
+def format_result(result: dict, baseline: dict|None = None) -> str:
+    line = f"{result['nodes']:>8}   {result['scenario']:<8}   {result['wall']:9.3f}"
+    line += f"   {result['pages_per_sec']:9.1f}   {result['peak_rss_mb']:9.1f}"
+    if baseline:
+        line += f"   {result['wall'] / baseline['wall']:6.2f}x"
+        line += f"   {result['peak_rss_mb'] / baseline['peak_rss_mb']:6.2f}x"
+    return line
+
+
+def print_comparison(results: list[dict], path: str):
+    with open(path, encoding='utf-8') as file:
+        old = json.load(file)
+    baselines = {(r['nodes'], r['scenario']): r for r in old['results']}
+    print()
+    print(f"Compared with: {path}")
+    print("   nodes   scenario    wall (s)     pages/s    RSS (MB)     wall      RSS")
+    for result in results:
+        print(format_result(result, baselines.get((result['nodes'], result['scenario']))))
+
+
+def main():
+    argparser = argslib.ArgParser(helptext)
+    argparser.flag("automenu a")
+    argparser.flag("keep k")
+    argparser.option("ark")
+    argparser.option("args", default="")
+    argparser.option("compare")
+    argparser.option("depth d", type=int, default=3)
+    argparser.option("features f", default="headings,lists,code,links,emphasis")
+    argparser.option("json")
+    argparser.option("meta m", type=int, default=5)
+    argparser.option("sizes n", default="1000,10000,100000")
+    argparser.option("size s", type=int, default=2000)
+    argparser.option("theme t", default="graphite")
+    argparser.option("workdir w")
+    argparser.parse()
+
+    options = {
+        'depth': argparser.value('depth'),
+        'size': argparser.value('size'),
+        'meta': argparser.value('meta'),
+        'features': [f.strip() for f in argparser.value('features').split(',') if f.strip()],
+        'theme': argparser.value('theme'),
+        'automenu': argparser.found('automenu'),
+    }
+    sizes = [int(n) for n in argparser.value('sizes').split(',')]
+    build_args = shlex.split(argparser.value('args'))
+
+    if argparser.found('ark'):
+        ark_cmd = shlex.split(argparser.value('ark'))
+    else:
+        ark_cmd = [sys.executable, '-m', 'ark']
+        repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [repo, os.environ.get('PYTHONPATH')]))
+
+    workdir = argparser.value('workdir') or tempfile.mkdtemp(prefix='ark-bench-')
+    os.makedirs(workdir, exist_ok=True)
+
+    print("   nodes   scenario    wall (s)     pages/s    RSS (MB)")
+    results = []
+    try:
+        for num_nodes in sizes:
+            results.extend(run_size(num_nodes, options, workdir, ark_cmd, build_args))
+    finally:
+        if not argparser.found('keep'):
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if argparser.found('json'):
+        report = {
+            'ark': shlex.join(ark_cmd),
+            'args': build_args,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': options,
+            'results': results,
+        }
+        with open(argparser.value('json'), 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+            file.write('\n')
+
+    if argparser.found('compare'):
+        print_comparison(results, argparser.value('compare'))
+
+
+if __name__ == '__main__':
+    main()